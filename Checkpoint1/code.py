@@ -1,41 +1,58 @@
-
-
-# Provjera da li je python instaliran na sustavu
-print("Hello World")
-
-
-# Učitavanje potrebnih biblioteka
-import pandas as pd
-
-# Učitavanje podataka iz CSV datoteke
-PATH = "C:/Users/domin/Desktop/SIRP_full_projekt/Checkpoint1/data/lol_ranked_games.csv"
-
-data = pd.read_csv(PATH, delimiter=',')
-
-# Učitavanje prvih 2000 redova
-data_first_2000 = pd.read_csv(PATH, delimiter=',', nrows=2000)
-
-# Ispis prvih 5 redova
-print(data_first_2000.head())
-
-
-
-# Ispis dimenzija skupa podataka (potrebno je učitati sve podatke radi analize, ne samo prvih 2000 redova)
-print(data.shape)
-
-# Ispis imena stupaca i nedostajućih vrijednosti
-print(data.isna().sum())
-
-# Ispis broja jedinstvenih vrijednosti po stupcima
-print(data.nunique())
-
-# Ispis tipova podataka po stupcima (analiza kvanitativnih i kvalitativnih varijabli)
-print(data.dtypes)
-
-# Ispis broja jedinstvenih vrijednosti po stupcima
-for column in data:
-    print(data[column].value_counts())
-    input("...")
-
-# Ispis imena stupaca
-print(data.columns.values)
\ No newline at end of file
+# Provjera da li je python instaliran na sustavu
+print("Hello World")
+
+
+# Učitavanje potrebnih biblioteka
+import os
+import sys
+from itertools import chain
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.reader import iter_chunks
+
+# Učitavanje podataka iz CSV datoteke
+PATH = "C:/Users/domin/Desktop/SIRP_full_projekt/Checkpoint1/data/lol_ranked_games.csv"
+
+# Podaci se čitaju u dijelovima (chunk), tako da cijela datoteka nikad nije u memoriji
+chunks = iter_chunks(PATH)
+first_chunk = next(chunks)
+
+# Prvih 2000 redova dolazi iz prvog dijela, nije potrebno drugo čitanje datoteke
+data_first_2000 = first_chunk.head(2000)
+
+# Ispis prvih 5 redova
+print(data_first_2000.head())
+
+
+# Statistike se zbrajaju dio po dio (potrebno je proći sve podatke radi analize, ne samo prvih 2000 redova)
+n_rows = 0
+missing = 0
+value_counts = {column: pd.Series(dtype='int64') for column in first_chunk.columns}
+
+for chunk in chain([first_chunk], chunks):
+    n_rows += len(chunk)
+    missing = missing + chunk.isna().sum()
+    for column in chunk:
+        counts = chunk[column].value_counts()
+        value_counts[column] = value_counts[column].add(counts, fill_value=0)
+
+# Ispis dimenzija skupa podataka
+print((n_rows, len(first_chunk.columns)))
+
+# Ispis imena stupaca i nedostajućih vrijednosti
+print(missing)
+
+# Ispis broja jedinstvenih vrijednosti po stupcima
+print(pd.Series({column: len(counts) for column, counts in value_counts.items()}))
+
+# Ispis tipova podataka po stupcima (analiza kvanitativnih i kvalitativnih varijabli)
+print(first_chunk.dtypes)
+
+# Ispis broja jedinstvenih vrijednosti po stupcima
+for column in value_counts:
+    print(value_counts[column].astype('int64').sort_values(ascending=False))
+    input("...")
+
+# Ispis imena stupaca
+print(first_chunk.columns.values)
@@ -0,0 +1,62 @@
+"""Size benchmark of the delta storage (spi.py --storage delta).
+
+Loads the CSV into two SQLite files, once with the verbatim tables and once with
+delta storage, and compares load time, rows and file size. That read_table() gives
+back the verbatim tables is tested in tests/test_delta_store.py.
+
+    python delta_benchmark.py --csv lol_ranked_games.csv
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.reader import CHUNK_SIZE
+from parallel_loader import ParallelLoader, create_loader_engine
+from spi import load_full
+
+TABLES = ['objectivestatus', 'structurestatus']
+
+
+def load(csv_path, db_path, storage, chunksize):
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    engine = create_loader_engine(f'sqlite:///{db_path}', 1)
+    loader = ParallelLoader(engine, 1, 'native')
+    start = time.perf_counter()
+    try:
+        load_full(csv_path, loader, chunksize, storage)
+    finally:
+        loader.close()
+    return engine, time.perf_counter() - start
+
+
+def row_counts(engine, tables):
+    with engine.connect() as conn:
+        return {table: pd.read_sql(f"SELECT count(*) AS n FROM {table}", conn)['n'][0] for table in tables}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Delta storage size benchmark (SQLite)')
+    parser.add_argument('--csv', required=True)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--out-dir', default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    wide_path = os.path.join(args.out_dir, 'lol_wide.db')
+    delta_path = os.path.join(args.out_dir, 'lol_delta.db')
+    wide_engine, wide_seconds = load(args.csv, wide_path, 'wide', args.chunk_size)
+    delta_engine, delta_seconds = load(args.csv, delta_path, 'delta', args.chunk_size)
+
+    wide_rows = row_counts(wide_engine, TABLES)
+    delta_rows = row_counts(delta_engine, [f'{t}_changes' for t in TABLES])
+    for table in TABLES:
+        print(f"[INFO] {table}: {wide_rows[table]} rows -> {delta_rows[table + '_changes']} changes")
+    wide_size, delta_size = os.path.getsize(wide_path), os.path.getsize(delta_path)
+    print(f"[INFO] wide:  {wide_size / 2**20:8.2f} MB, loaded in {wide_seconds:.2f}s")
+    print(f"[INFO] delta: {delta_size / 2**20:8.2f} MB, loaded in {delta_seconds:.2f}s "
+          f"({wide_size / delta_size:.1f}x smaller)")
@@ -0,0 +1,105 @@
+"""Change-only (run-length) storage of the per frame counter tables.
+
+objectivestatus and structurestatus repeat the cumulative counters of a game in
+every frame although most of them do not change from one frame to the next. In
+delta storage such a table is written as <table>_changes with one row
+(gameId, frame, field, value) per value that differs from the previous frame of
+the same game (a game starts from all zeros). delta_fields maps the field numbers
+back to column names.
+
+gamestate stays verbatim: gold/experience differences change in nearly every frame,
+so a change list would be larger than the table. It also provides the
+(gameId, frame) rows of every game.
+
+read_table() rebuilds the verbatim table: the changes are scattered into a
+frames x fields grid and forward filled.
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+
+from common.schema import pandas_dtypes
+
+KEY_COLUMNS = ['gameId', 'frame']
+
+
+class DeltaEncoder:
+    """Changed values of one table. Chunks must come in file order: the last row of
+    a chunk is kept to continue a game that is split over two chunks."""
+
+    def __init__(self, table, columns):
+        self.table = table
+        self.fields = [col for col in columns if col not in KEY_COLUMNS]
+        self.last_game = None
+        self.last_values = None
+
+    def encode(self, chunk):
+        values = chunk[self.fields].to_numpy(dtype='float64')
+        games = chunk['gameId'].to_numpy()
+        if not len(chunk):
+            return pd.DataFrame({'gameId': [], 'frame': [], 'field': [], 'value': []})
+
+        previous = np.zeros_like(values)
+        previous[1:] = values[:-1]
+        new_game = np.ones(len(chunk), dtype=bool)
+        new_game[1:] = games[1:] != games[:-1]
+        previous[new_game] = 0
+        if games[0] == self.last_game:
+            previous[0] = self.last_values
+        self.last_game, self.last_values = games[-1], values[-1]
+
+        rows, fields = np.nonzero(values != previous)
+        return pd.DataFrame({
+            'gameId': games[rows],
+            'frame': chunk['frame'].to_numpy()[rows],
+            'field': fields.astype(np.int16),
+            'value': values[rows, fields],
+        })
+
+    def field_rows(self):
+        return pd.DataFrame({'table_name': self.table, 'field': range(len(self.fields)), 'column_name': self.fields})
+
+
+def decode(frame_index, changes, fields):
+    """Full table from the (gameId, frame) rows and the changes of those rows."""
+    frame_index = frame_index.sort_values(KEY_COLUMNS, kind='stable').reset_index(drop=True)
+    grid = np.full((len(frame_index), len(fields)), np.nan)
+    games = frame_index['gameId'].to_numpy()
+    first = np.ones(len(games), dtype=bool)
+    first[1:] = games[1:] != games[:-1]
+    # Every game starts from zeros, so the forward fill never crosses into the next game
+    grid[first] = 0
+
+    positions = pd.MultiIndex.from_frame(frame_index[KEY_COLUMNS]) \
+        .get_indexer(pd.MultiIndex.from_frame(changes[KEY_COLUMNS]))
+    if (positions < 0).any():
+        orphans = changes.loc[positions < 0, KEY_COLUMNS].drop_duplicates()
+        raise ValueError(f"{len(orphans)} (gameId, frame) pairs of the changes have no row in the frame index, "
+                         f"e.g. {orphans.head(3).to_dict('records')}")
+    grid[positions, changes['field'].to_numpy(dtype=np.intp)] = changes['value'].to_numpy()
+    values = pd.DataFrame(grid, columns=fields).ffill()
+
+    table = pd.concat([frame_index[KEY_COLUMNS], values], axis=1)
+    return table.astype(pandas_dtypes(list(table.columns)))
+
+
+def read_table(con, table, game_ids=None):
+    """Reads a delta stored table back in its verbatim layout, optionally only some games."""
+    fields = pd.read_sql(text("SELECT field, column_name FROM delta_fields WHERE table_name = :t ORDER BY field"),
+                         con, params={'t': table})['column_name'].tolist()
+    where = ''
+    params = {}
+    if game_ids is not None:
+        params = {f'g{i}': int(g) for i, g in enumerate(game_ids)}
+        where = f" WHERE gameId IN ({', '.join(':' + name for name in params)})"
+    frame_index = pd.read_sql(text(f"SELECT gameId, frame FROM gamestate{where}"), con, params=params)
+    changes = pd.read_sql(text(f"SELECT gameId, frame, field, value FROM {table}_changes{where}"), con, params=params)
+    return decode(frame_index, changes, fields)
+
+
+def write_fields(con, encoders):
+    # Rewritten on every load, the field numbers only depend on the column lists
+    if inspect(con).has_table('delta_fields'):
+        con.execute(text("DELETE FROM delta_fields"))
+    fields = pd.concat([encoder.field_rows() for encoder in encoders.values()], ignore_index=True)
+    fields.to_sql('delta_fields', con=con, if_exists='append', index=False)
@@ -0,0 +1,108 @@
+"""Parallel table writer for the normalized schema.
+
+The parent table (game) is written first because of the foreign keys, the other
+tables of the same chunk are then written at the same time from a thread pool,
+each worker on its own pooled connection. Rows per second are tracked per table,
+the insert and commit time also in the RunStats of the run when one is given.
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import MetaData, Table, create_engine, text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.instrumentation import RunStats
+
+METHODS = ['default', 'multi', 'native']
+
+
+def create_loader_engine(db_url, workers):
+    # One connection per worker plus one for the parent table
+    if db_url.startswith('sqlite'):
+        return create_engine(db_url, connect_args={'timeout': 60})
+    connect_args = {}
+    if db_url.startswith('mysql+mysqlconnector'):
+        connect_args['allow_local_infile'] = True
+    elif db_url.startswith('mysql+pymysql'):
+        connect_args['local_infile'] = True
+    return create_engine(db_url, pool_size=workers + 1, max_overflow=0, connect_args=connect_args)
+
+
+def native_insert(conn, name, frame):
+    """Fast path of the database: LOAD DATA LOCAL INFILE for MySQL, executemany of the driver for
+    SQLite and a SQLAlchemy executemany for every other database."""
+    # Creates the table the same way to_sql would if it does not exist yet
+    frame.head(0).to_sql(name, con=conn, if_exists='append', index=False)
+    columns = ', '.join(f'`{col}`' for col in frame.columns)
+    dialect = conn.engine.dialect.name
+
+    if dialect == 'mysql':
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='') as f:
+            frame.astype({col: 'int8' for col in frame.columns if frame[col].dtype == bool}) \
+                .to_csv(f, index=False, header=False)
+        try:
+            path = f.name.replace('\\', '/')
+            conn.execute(text(f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE `{name}` "
+                              f"FIELDS TERMINATED BY ',' LINES TERMINATED BY '\\n' ({columns})"))
+        finally:
+            os.remove(f.name)
+    elif dialect == 'sqlite':
+        # sqlite3 uses qmark placeholders
+        placeholders = ', '.join('?' for _ in frame.columns)
+        rows = frame.astype(object).itertuples(index=False, name=None)
+        conn.connection.driver_connection.executemany(
+            f"INSERT INTO `{name}` ({columns}) VALUES ({placeholders})", list(rows))
+    else:
+        # The placeholder style and the quoting of the driver are left to SQLAlchemy
+        table = Table(name, MetaData(), autoload_with=conn)
+        records = frame.astype(object).where(frame.notna(), None).to_dict('records')
+        conn.execute(table.insert(), records)
+
+
+class ParallelLoader:
+    def __init__(self, engine, workers=4, method='default', chunksize=1000, stats=None):
+        self.engine = engine
+        self.run_stats = stats if stats is not None else RunStats('parallel_loader')
+        self.method = method
+        self.chunksize = chunksize
+        # SQLite allows a single writer only, extra threads would just wait for the lock
+        self.workers = 1 if engine.dialect.name == 'sqlite' else workers
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.stats = {}
+
+    def write(self, name, frame):
+        start = time.perf_counter()
+        with self.engine.connect() as conn:
+            transaction = conn.begin()
+            with self.run_stats.stage('insert', rows=len(frame)):
+                if self.method == 'native':
+                    native_insert(conn, name, frame)
+                else:
+                    frame.to_sql(name, con=conn, if_exists='append', index=False, chunksize=self.chunksize,
+                                 method='multi' if self.method == 'multi' else None)
+            with self.run_stats.stage('commit'):
+                transaction.commit()
+        return name, len(frame), time.perf_counter() - start
+
+    def _record(self, name, rows, seconds):
+        total_rows, total_seconds = self.stats.get(name, (0, 0.0))
+        self.stats[name] = (total_rows + rows, total_seconds + seconds)
+
+    def load(self, tables, parent='game'):
+        """Writes tables[parent] first, then all other tables concurrently."""
+        self._record(*self.write(parent, tables[parent]))
+        futures = [self.pool.submit(self.write, name, frame)
+                   for name, frame in tables.items() if name != parent]
+        for future in futures:
+            self._record(*future.result())
+
+    def report(self):
+        for name, (rows, seconds) in self.stats.items():
+            rate = rows / seconds if seconds else float('inf')
+            print(f"[INFO] {name}: {rows} rows in {seconds:.2f}s ({rate:,.0f} rows/s)")
+
+    def close(self):
+        self.pool.shutdown()
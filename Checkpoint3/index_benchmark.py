@@ -0,0 +1,87 @@
+"""Query plans and timings of the typical fact table slices, without and with the indexes.
+
+Runs against a SQLite star schema loaded by Checkpoint4/etl_fake.py, e.g.
+
+    python Checkpoint4/etl_fake.py --csv lol_ranked_games.csv --db-url sqlite:///lol_experiment.db
+    python Checkpoint3/index_benchmark.py --db lol_experiment.db
+
+The indexes are dropped for the first round and recreated for the second one, so
+the database is left with all indexes in place.
+"""
+import argparse
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Checkpoint3.starshema import drop_fact_indexes, create_fact_indexes
+
+# The state measures (gold_diff, ...) are NULL on the event rows, count(gold_diff) counts state rows
+STATE_ROWS = "objective_tk IS NULL AND structure_tk IS NULL"
+
+QUERIES = {
+    'per game': "SELECT frame, gold_diff, exp_diff FROM fact_game_event "
+                f"WHERE game_id = :game_id AND {STATE_ROWS} ORDER BY frame",
+    'frame range': "SELECT count(gold_diff), avg(gold_diff) FROM fact_game_event WHERE frame BETWEEN :low AND :high",
+    'per team at frame': "SELECT gold_diff, kills FROM fact_game_event "
+                         f"WHERE frame = :frame AND team_id = :team_id AND {STATE_ROWS}",
+    'per objective': "SELECT count(*), sum(event_count) FROM fact_game_event WHERE objective_tk = :objective_tk",
+    'per structure': "SELECT count(*), sum(event_count) FROM fact_game_event WHERE structure_tk = :structure_tk",
+}
+
+
+def sample_params(conn):
+    # Parameters taken from a fact row in the middle of the table
+    n = conn.execute(text("SELECT count(*) FROM fact_game_event")).scalar()
+    row = conn.execute(text("SELECT game_id, frame, team_id FROM fact_game_event LIMIT 1 OFFSET :n"),
+                       {'n': n // 2}).one()
+    return {
+        'game_id': row.game_id, 'frame': row.frame, 'team_id': row.team_id,
+        'low': 600, 'high': 900,
+        'objective_tk': conn.execute(text("SELECT min(objective_tk) FROM fact_game_event")).scalar(),
+        'structure_tk': conn.execute(text("SELECT min(structure_tk) FROM fact_game_event")).scalar(),
+    }
+
+
+def run_round(engine, params, repeat):
+    timings = {}
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            plan = conn.execute(text('EXPLAIN QUERY PLAN ' + sql), params).all()
+            runs = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                runs.append(time.perf_counter() - start)
+            timings[name] = sorted(runs)[len(runs) // 2]
+            print(f"  {name:<18} {timings[name] * 1000:9.3f} ms  | {'; '.join(row[-1] for row in plan)}")
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fact table index benchmark (SQLite)')
+    parser.add_argument('--db', default='lol_experiment.db', help='SQLite file loaded by etl_fake.py')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine(f'sqlite:///{args.db}')
+    with engine.connect() as conn:
+        params = sample_params(conn)
+
+    print("[INFO] without indexes")
+    drop_fact_indexes(engine)
+    before = run_round(engine, params, args.repeat)
+
+    start = time.perf_counter()
+    create_fact_indexes(engine)
+    print(f"[INFO] indexes built in {time.perf_counter() - start:.2f}s")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+    print("[INFO] with indexes")
+    after = run_round(engine, params, args.repeat)
+
+    for name in QUERIES:
+        print(f"[INFO] {name}: {before[name] / after[name]:.1f}x faster")
@@ -1,100 +1,234 @@
-from pyspark.sql import SparkSession
-
-# Start Spark session and include MySQL JDBC driver
-spark = SparkSession.builder \
-    .appName("LoL ETL") \
-    .config("spark.jars", "C:/path/to/mysql-connector-java.jar") \
-    .getOrCreate()
-
-try:
-    # 1. Load your CSV file
-    csv_path = r"C:\Users\domin\Desktop\SIRP-Checkpoint 2\lol_ranked_games.csv"
-    print(f"Loading CSV from: {csv_path}")
-    df = spark.read.option("header", True).csv(csv_path)
-    print("CSV loaded. Columns:", df.columns)
-    print("Sample data:")
-    df.show(5)
-
-    # 2. Extract unique games for Game table
-    print("\nExtracting Game table...")
-    games_df = df.select("gameId", "gameDuration").dropDuplicates()
-    games_df.show(5)
-
-    # 3. Extract data for GameState table
-    print("\nExtracting GameState table...")
-    game_state_columns = [
-        "gameId", "frame", "goldDiff", "expDiff", "champLevelDiff",
-        "isFirstTower", "isFirstBlood", "kills", "deaths",
-        "assists", "wardsPlaced", "wardsDestroyed", "wardsLost"
-    ]
-    game_state_df = df.select(game_state_columns)
-    game_state_df.show(5)
-
-    # 4. Extract data for ObjectiveStatus table
-    print("\nExtracting ObjectiveStatus table...")
-    objective_columns = [
-        "gameId", "frame", "killedFireDrake", "killedWaterDrake",
-        "killedAirDrake", "killedEarthDrake", "killedElderDrake",
-        "lostFireDrake", "lostWaterDrake", "lostAirDrake",
-        "lostEarthDrake", "lostElderDrake", "killedBaronNashor",
-        "lostBaronNashor", "killedRiftHerald", "lostRiftHerald"
-    ]
-    objective_df = df.select(objective_columns)
-    objective_df.show(5)
-
-    # 5. Extract data for StructureStatus table
-    print("\nExtracting StructureStatus table...")
-    structure_columns = ["gameId", "frame"]
-    # Append all columns that contain 'destroyed' or 'lost'
-    structure_columns += [col for col in df.columns if 'destroyed' in col.lower() or 'lost' in col.lower()]
-    # Remove non-structure columns
-    non_structure_cols = [
-        'lostFireDrake', 'lostWaterDrake', 'lostAirDrake', 'lostEarthDrake',
-        'lostElderDrake', 'lostBaronNashor', 'lostRiftHerald', 'wardsLost'
-    ]
-    structure_columns = [col for col in structure_columns if col not in non_structure_cols]
-    structure_df = df.select(structure_columns)
-    structure_df.show(5)
-
-    # 6. Extract data for TeamResult table
-    print("\nExtracting TeamResult table...")
-    team_result_df = df.select("gameId", "hasWon").dropDuplicates()
-    team_result_df.show(5)
-
-    # 7. Write all tables to MySQL using JDBC
-    jdbc_url = "jdbc:mysql://localhost:3306/lol-ranked"
-    properties = {
-        "user": "root",
-        "password": "root",
-        "driver": "com.mysql.cj.jdbc.Driver"
-    }
-
-    print("\nWriting Game table...")
-    games_df.write.jdbc(url=jdbc_url, table="game", mode="append", properties=properties)
-    print("Game table written.")
-
-    print("Writing GameState table...")
-    game_state_df.write.jdbc(url=jdbc_url, table="gamestate", mode="append", properties=properties)
-    print("GameState table written.")
-
-    print("Writing ObjectiveStatus table...")
-    objective_df.write.jdbc(url=jdbc_url, table="objectivestatus", mode="append", properties=properties)
-    print("ObjectiveStatus table written.")
-
-    print("Writing StructureStatus table...")
-    structure_df.write.jdbc(url=jdbc_url, table="structurestatus", mode="append", properties=properties)
-    print("StructureStatus table written.")
-
-    print("Writing TeamResult table...")
-    team_result_df.write.jdbc(url=jdbc_url, table="teamresult", mode="append", properties=properties)
-    print("TeamResult table written.")
-
-    print("\n=== ETL PROCESS COMPLETED SUCCESSFULLY! ===")
-
-except Exception as e:
-    print(f"An error occurred: {str(e)}")
-    import traceback
-    traceback.print_exc()
-finally:
-    spark.stop()
-    print("Spark session stopped.")
+import argparse
+import csv
+import os
+import sys
+from pyspark.sql import SparkSession, functions as F
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.schema import spark_schema
+from common.instrumentation import RunStats
+
+parser = argparse.ArgumentParser(description='Spark ETL for the normalized schema')
+parser.add_argument('--incremental', action='store_true',
+                    help='only load games that are not in etl_loaded_game yet')
+parser.add_argument('--csv', default=r"C:\Users\domin\Desktop\SIRP-Checkpoint 2\lol_ranked_games.csv")
+parser.add_argument('--master', default=None, help='e.g. local[*] for a local test run')
+parser.add_argument('--jars', default="C:/path/to/mysql-connector-java.jar", help='JDBC driver jar(s)')
+parser.add_argument('--jdbc-url', default="jdbc:mysql://localhost:3306/lol-ranked",
+                    help='e.g. jdbc:sqlite:lol-ranked.db (with --driver org.sqlite.JDBC --partitions 1)')
+parser.add_argument('--driver', default="com.mysql.cj.jdbc.Driver")
+parser.add_argument('--user', default="root")
+parser.add_argument('--password', default="root")
+parser.add_argument('--partitions', type=int, default=8,
+                    help='partitions by gameId = parallel JDBC writers (SQLite allows only one writer)')
+parser.add_argument('--batch-size', type=int, default=10000, help='rows per JDBC batch insert')
+parser.add_argument('--debug', action='store_true', help='show samples of every table (one Spark job each)')
+parser.add_argument('--report', default=None,
+                    help='write a JSON run report here (driver side: stage times, rows/s, peak RSS of the driver)')
+args = parser.parse_args()
+
+# Spark is lazy: extract covers reading and caching the CSV, every insert also runs the
+# select of its table. JDBC statements are sent by the executors and are not counted.
+stats = RunStats('etl_spark')
+
+# Error texts of a missing table (SQLite, MySQL, PostgreSQL), every other JDBC error is raised
+MISSING_TABLE_ERRORS = ('no such table', "doesn't exist", 'does not exist')
+
+
+def read_game_ids(jdbc_url, properties, table, column):
+    """Distinct game ids of a table as a one column frame named gameId, None if the table does not exist."""
+    query = f"(SELECT DISTINCT {column} AS gameId FROM {table}) game_ids"
+    try:
+        return spark.read.jdbc(url=jdbc_url, table=query, properties=properties)
+    except Exception as e:
+        message = str(e).lower()
+        if table in message and any(text in message for text in MISSING_TABLE_ERRORS):
+            return None
+        raise
+
+
+def not_loaded(frame, jdbc_url, properties, table, interrupted):
+    # Rows of the interrupted games (see below) that already landed in the table are not written again.
+    # The filter goes to the database, only the rows of those games are read.
+    if not interrupted:
+        return frame
+    landed = spark.read.jdbc(url=jdbc_url, table=table, properties=properties) \
+        .select("gameId").where(F.col("gameId").isin(interrupted)).distinct()
+    return frame.join(landed, on="gameId", how="left_anti")
+
+
+def debug_show(frame):
+    if args.debug:
+        frame.show(5)
+
+
+# Start Spark session and include the JDBC driver
+builder = SparkSession.builder \
+    .appName("LoL ETL") \
+    .config("spark.jars", args.jars)
+if args.master:
+    builder = builder.master(args.master)
+spark = builder.getOrCreate()
+
+try:
+    # 1. Load your CSV file
+    csv_path = args.csv
+    print(f"Loading CSV from: {csv_path}")
+    # Declared schema instead of reading every column as a string
+    with open(csv_path, newline='') as f:
+        header = next(csv.reader(f))
+    df = spark.read.option("header", True).schema(spark_schema(header)).csv(csv_path)
+    print("CSV loaded. Columns:", df.columns)
+
+    jdbc_url = args.jdbc_url
+    # MySQL Connector/J only sends a JDBC batch as one multi-row INSERT with rewriteBatchedStatements
+    if jdbc_url.startswith("jdbc:mysql:") and "rewriteBatchedStatements" not in jdbc_url:
+        jdbc_url += ("&" if "?" in jdbc_url else "?") + "rewriteBatchedStatements=true"
+    properties = {
+        "user": args.user,
+        "password": args.password,
+        "driver": args.driver,
+        "batchsize": str(args.batch_size),
+        "numPartitions": str(args.partitions),
+    }
+
+    # Incremental mode: drop games already recorded in the watermark table etl_loaded_game (shared
+    # with spi.py --incremental), the only table read on a normal run. The watermark is written
+    # after the five tables, in its own JDBC job, so the games of a run are recorded in
+    # etl_pending_game before its data. Pending games without a watermark belong to a run that
+    # failed in between: they are loaded again and not_loaded() skips their rows that already
+    # landed (the rows of a game are in one partition, a partition is one JDBC transaction).
+    interrupted = []
+    if args.incremental:
+        loaded_games = read_game_ids(jdbc_url, properties, "etl_loaded_game", "game_id")
+        pending_games = read_game_ids(jdbc_url, properties, "etl_pending_game", "game_id")
+        if loaded_games is None and pending_games is None:
+            # First incremental run on this database: games loaded before without a watermark
+            # are taken from the game table, once
+            loaded_games = read_game_ids(jdbc_url, properties, "game", "gameId")
+            if loaded_games is not None:
+                print("No etl_loaded_game watermark yet, recording the games of the game table")
+                loaded_games.select(F.col("gameId").alias("game_id")) \
+                    .write.jdbc(url=jdbc_url, table="etl_loaded_game", mode="append", properties=properties)
+        if pending_games is not None:
+            if loaded_games is not None:
+                pending_games = pending_games.join(loaded_games, on="gameId", how="left_anti")
+            # Collected now, etl_pending_game is overwritten below
+            interrupted = [row.gameId for row in pending_games.collect()]
+            if interrupted:
+                print(f"{len(interrupted)} games of an interrupted run are loaded again")
+        if loaded_games is not None:
+            df = df.join(loaded_games, on="gameId", how="left_anti")
+
+    # The CSV is read once: all five tables are selected from the cached source. Partitioning by
+    # gameId keeps the rows of a game together (no extra shuffle for the game/teamresult dedup)
+    # and gives one JDBC writer per partition.
+    df = df.repartition(args.partitions, "gameId").cache()
+    with stats.stage('extract'):
+        source_rows = df.count()
+    stats.add_rows('extract', source_rows)
+    print(f"Source rows: {source_rows}")
+    if args.incremental:
+        with stats.stage('insert'):
+            df.select(df["gameId"].alias("game_id")).distinct().write.option("truncate", "true") \
+                .jdbc(url=jdbc_url, table="etl_pending_game", mode="overwrite", properties=properties)
+    print("Sample data:")
+    debug_show(df)
+
+    # 2. Extract unique games for Game table
+    print("\nExtracting Game table...")
+    games_df = df.select("gameId", "gameDuration").dropDuplicates()
+    debug_show(games_df)
+
+    # 3. Extract data for GameState table
+    print("\nExtracting GameState table...")
+    game_state_columns = [
+        "gameId", "frame", "goldDiff", "expDiff", "champLevelDiff",
+        "isFirstTower", "isFirstBlood", "kills", "deaths",
+        "assists", "wardsPlaced", "wardsDestroyed", "wardsLost"
+    ]
+    game_state_df = df.select(game_state_columns)
+    debug_show(game_state_df)
+
+    # 4. Extract data for ObjectiveStatus table
+    print("\nExtracting ObjectiveStatus table...")
+    objective_columns = [
+        "gameId", "frame", "killedFireDrake", "killedWaterDrake",
+        "killedAirDrake", "killedEarthDrake", "killedElderDrake",
+        "lostFireDrake", "lostWaterDrake", "lostAirDrake",
+        "lostEarthDrake", "lostElderDrake", "killedBaronNashor",
+        "lostBaronNashor", "killedRiftHerald", "lostRiftHerald"
+    ]
+    objective_df = df.select(objective_columns)
+    debug_show(objective_df)
+
+    # 5. Extract data for StructureStatus table
+    print("\nExtracting StructureStatus table...")
+    structure_columns = ["gameId", "frame"]
+    # Append all columns that contain 'destroyed' or 'lost'
+    structure_columns += [col for col in df.columns if 'destroyed' in col.lower() or 'lost' in col.lower()]
+    # Remove non-structure columns
+    non_structure_cols = [
+        'lostFireDrake', 'lostWaterDrake', 'lostAirDrake', 'lostEarthDrake',
+        'lostElderDrake', 'lostBaronNashor', 'lostRiftHerald', 'wardsLost'
+    ]
+    structure_columns = [col for col in structure_columns if col not in non_structure_cols]
+    structure_df = df.select(structure_columns)
+    debug_show(structure_df)
+
+    # 6. Extract data for TeamResult table
+    print("\nExtracting TeamResult table...")
+    team_result_df = df.select("gameId", "hasWon").dropDuplicates()
+    debug_show(team_result_df)
+
+    # 7. Write all tables to MySQL using JDBC
+    print("\nWriting Game table...")
+    with stats.stage('insert'):
+        not_loaded(games_df, jdbc_url, properties, "game", interrupted) \
+            .write.jdbc(url=jdbc_url, table="game", mode="append", properties=properties)
+    print("Game table written.")
+
+    print("Writing GameState table...")
+    with stats.stage('insert'):
+        not_loaded(game_state_df, jdbc_url, properties, "gamestate", interrupted) \
+            .write.jdbc(url=jdbc_url, table="gamestate", mode="append", properties=properties)
+    print("GameState table written.")
+
+    print("Writing ObjectiveStatus table...")
+    with stats.stage('insert'):
+        not_loaded(objective_df, jdbc_url, properties, "objectivestatus", interrupted) \
+            .write.jdbc(url=jdbc_url, table="objectivestatus", mode="append", properties=properties)
+    print("ObjectiveStatus table written.")
+
+    print("Writing StructureStatus table...")
+    with stats.stage('insert'):
+        not_loaded(structure_df, jdbc_url, properties, "structurestatus", interrupted) \
+            .write.jdbc(url=jdbc_url, table="structurestatus", mode="append", properties=properties)
+    print("StructureStatus table written.")
+
+    print("Writing TeamResult table...")
+    with stats.stage('insert'):
+        not_loaded(team_result_df, jdbc_url, properties, "teamresult", interrupted) \
+            .write.jdbc(url=jdbc_url, table="teamresult", mode="append", properties=properties)
+    print("TeamResult table written.")
+
+    if args.incremental:
+        print("Recording loaded games...")
+        with stats.stage('insert'):
+            df.select(df["gameId"].alias("game_id")).distinct() \
+                .write.jdbc(url=jdbc_url, table="etl_loaded_game", mode="append", properties=properties)
+        print("Watermark updated.")
+
+    df.unpersist()
+    stats.print_report()
+    if args.report:
+        stats.write(args.report)
+    print("\n=== ETL PROCESS COMPLETED SUCCESSFULLY! ===")
+
+except Exception as e:
+    print(f"An error occurred: {str(e)}")
+    import traceback
+    traceback.print_exc()
+finally:
+    spark.stop()
+    print("Spark session stopped.")
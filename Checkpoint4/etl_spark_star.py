@@ -0,0 +1,252 @@
+"""Star schema ETL on Spark, the Spark version of etl_fake.py --mode bulk.
+
+Builds dim_game, dim_time, dim_team, dim_objective, dim_structure and fact_game_event
+from the CSV with column expressions only, so the load runs on all cores in
+local[*] mode. Dimension members that are already in the database are skipped
+(left anti join), new members get the same surrogate keys as in etl_fake.py
+(surrogate_keys.py) and the keys of the small objective/structure dimensions are
+looked up with broadcast joins. Like etl_fake.py, every CSV row gives one state fact
+row and every nonzero killed*/lost*/destroyed* counter delta one event fact row.
+
+Games that already have fact rows are skipped, so a re-run over the same CSV only
+loads the new games. The fact rows of one game are not written atomically: if the
+fact write fails partway, delete the facts of the games of that run before re-running.
+--db-url (the same database through SQLAlchemy) is required, it creates the schema
+so the existing members can be read on a fresh database.
+
+Local test run against SQLite:
+
+    python etl_spark_star.py --csv lol_ranked_games.csv --master local[*] \
+        --jars sqlite-jdbc.jar --driver org.sqlite.JDBC --jdbc-url jdbc:sqlite:lol_experiment.db \
+        --db-url sqlite:///lol_experiment.db --partitions 1
+"""
+import argparse
+import csv
+import os
+import sys
+
+from pyspark.sql import SparkSession, Window, functions as F
+from sqlalchemy import create_engine
+from surrogate_keys import FRAME_BITS, NAME_KEY_MASK
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.schema import COUNTER_COLUMNS, COUNTER_MEMBERS, spark_schema
+from Checkpoint3.starshema import Base, STATE_MEASURES
+from Checkpoint3 import summary_tables, star_query
+
+
+def game_phase(frame):
+    # Same limits as common.schema.game_phases
+    return F.when(frame < 900, 'Early').when(frame < 1800, 'Mid').otherwise('Late')
+
+
+def with_row_number(df):
+    """Adds the CSV row number (from 1) of every row of a frame read from one file.
+
+    monotonically_increasing_id() is (partition << 33) + position in the partition and the
+    partitions of a file scan are in file order, so the row number is the position plus the
+    rows of the earlier partitions. Only the row count per partition goes to the driver.
+    """
+    partition = F.spark_partition_id()
+    df = df.withColumn('_partition', partition) \
+        .withColumn('_position', F.monotonically_increasing_id() - F.shiftleft(partition.cast('long'), 33))
+    offsets, total = [], 0
+    for row in sorted(df.groupBy('_partition').count().collect()):
+        offsets += [F.lit(row['_partition']), F.lit(total)]
+        total += row['count']
+    offset = F.create_map(*offsets)[F.col('_partition')] if offsets else F.lit(0)
+    return df.withColumn('row_number', offset + F.col('_position') + 1).drop('_partition', '_position')
+
+
+def with_team_id(df):
+    # team_id = game_id << 16 | frame like surrogate_keys.team_keys, the side alternates with
+    # the CSV row number like in etl_fake.py
+    return with_row_number(df) \
+        .withColumn('team_id', F.shiftleft(F.col('gameId').cast('long'), FRAME_BITS).bitwiseOR(F.col('frame')))
+
+
+def read_table(spark, jdbc_url, properties, table):
+    return spark.read.jdbc(url=jdbc_url, table=table, properties=properties)
+
+
+def new_members(frame, existing, key):
+    return frame.join(existing.select(key), on=key, how='left_anti')
+
+
+def build_dim_game(df, existing):
+    games = df.select(F.col('gameId').alias('game_id'), F.col('gameDuration').alias('game_duration')) \
+        .dropDuplicates(['game_id'])
+    return new_members(games, existing, 'game_id') \
+        .withColumn('game_date', F.current_timestamp()) \
+        .withColumn('game_type', F.lit('Ranked'))
+
+
+def build_dim_time(df, existing):
+    frames = new_members(df.select('frame').distinct(), existing, 'frame')
+    return frames.select(
+        'frame',
+        F.floor(F.col('frame') / 60).cast('int').alias('minute'),
+        (F.col('frame') % 60).alias('second'),
+        game_phase(F.col('frame')).alias('game_phase'),
+    )
+
+
+def build_dim_team(df, existing):
+    teams = df.select(
+        'team_id',
+        F.when(F.col('row_number') % 2 == 0, 'Blue').otherwise('Red').alias('side'),
+        F.col('hasWon').cast('boolean').alias('has_won'),
+    )
+    return new_members(teams, existing, 'team_id')
+
+
+def build_members(spark, present, existing, dimension, columns, key):
+    # A member is only created when one of its counters is nonzero, like get_or_create in etl_fake.py
+    rows = []
+    for counter, (dim, name, category, member_type, lane) in COUNTER_MEMBERS.items():
+        if dim == dimension and (present[counter] or 0) > 0:
+            rows.append((name, category, member_type) if dim == 'objective' else (name, lane, member_type))
+    if not rows:
+        return None
+    # version/valid_from defaults of the models are applied by SQLAlchemy, not by the database
+    # Same key as surrogate_keys.name_key: CRC-32 of the UTF-8 name in 31 bits
+    return new_members(spark.createDataFrame(rows, columns).dropDuplicates([columns[0]]), existing, columns[0]) \
+        .withColumn(key, F.crc32(F.col(columns[0])).bitwiseAND(NAME_KEY_MASK).cast('int')) \
+        .withColumn('version', F.lit(1)) \
+        .withColumn('valid_from', F.current_timestamp())
+
+
+def state_columns():
+    return [
+        F.col('gameId').alias('game_id'),
+        F.col('frame'),
+        F.col('team_id'),
+        F.col('goldDiff').alias('gold_diff'),
+        F.col('expDiff').alias('exp_diff'),
+        F.col('champLevelDiff').alias('champ_level_diff'),
+        F.col('kills'),
+        F.col('deaths'),
+        F.col('assists'),
+        F.col('wardsPlaced').alias('wards_placed'),
+        F.col('wardsDestroyed').alias('wards_destroyed'),
+        F.col('wardsLost').alias('wards_lost'),
+        F.col('isFirstTower').cast('boolean').alias('is_first_tower'),
+        F.col('isFirstBlood').cast('boolean').alias('is_first_blood'),
+        F.col('frame').alias('event_time'),
+    ]
+
+
+def counter_events(df):
+    """One row per counter that changed since the previous frame of the same game (see unpivot.py)."""
+    previous = Window.partitionBy('gameId').orderBy('frame')
+    deltas = [F.col(c) - F.coalesce(F.lag(c).over(previous), F.lit(0)) for c in COUNTER_COLUMNS]
+    events = F.array(*[
+        F.when(delta != 0, F.struct(F.lit(c).alias('counter'), delta.cast('int').alias('event_count')))
+        for c, delta in zip(COUNTER_COLUMNS, deltas)
+    ])
+    return df.select(*state_columns(), F.explode(events).alias('event')) \
+        .where(F.col('event').isNotNull()) \
+        .select('*', 'event.*').drop('event')
+
+
+def build_fact(spark, df, objectives, structures):
+    state = df.select(*state_columns()) \
+        .withColumn('objective_tk', F.lit(None).cast('int')) \
+        .withColumn('structure_tk', F.lit(None).cast('int')) \
+        .withColumn('event_count', F.lit(None).cast('int'))
+
+    # The mapping and the dimensions have a few dozen rows, every executor gets a copy instead of a shuffle
+    members = spark.createDataFrame([(counter, name) for counter, (_, name, *_) in COUNTER_MEMBERS.items()],
+                                    ['counter', 'member_name'])
+    # Like unpivot.event_rows: the measures of the frame stay on its state row
+    events = counter_events(df).join(F.broadcast(members), on='counter') \
+        .join(F.broadcast(objectives.select(F.col('objective_name').alias('member_name'), 'objective_tk')),
+              on='member_name', how='left') \
+        .join(F.broadcast(structures.select(F.col('structure_name').alias('member_name'), 'structure_tk')),
+              on='member_name', how='left') \
+        .select(*[F.lit(None).cast(state.schema[c].dataType).alias(c) if c in STATE_MEASURES else F.col(c)
+                  for c in state.columns])
+    return state.unionByName(events)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Star schema ETL on Spark')
+    parser.add_argument('--csv', default='lol_ranked_games.csv')
+    parser.add_argument('--master', default=None, help='e.g. local[*]')
+    parser.add_argument('--jars', default="C:/path/to/mysql-connector-java.jar", help='JDBC driver jar(s)')
+    parser.add_argument('--jdbc-url', default="jdbc:mysql://localhost:3306/lol_experiment?rewriteBatchedStatements=true")
+    parser.add_argument('--driver', default="com.mysql.cj.jdbc.Driver")
+    parser.add_argument('--user', default="root")
+    parser.add_argument('--password', default="root")
+    parser.add_argument('--db-url', required=True,
+                        help='SQLAlchemy URL of the same database: creates the schema and rebuilds the summaries')
+    parser.add_argument('--partitions', type=int, default=8, help='partitions by gameId = parallel JDBC writers')
+    parser.add_argument('--batch-size', type=int, default=10000, help='rows per JDBC batch insert')
+    parser.add_argument('--debug', action='store_true', help='show samples of every table (one Spark job each)')
+    args = parser.parse_args()
+
+    # The JDBC reads of the existing members need the tables, also on a fresh database
+    engine = create_engine(args.db_url)
+    Base.metadata.create_all(engine)
+    summary_tables.create_all(engine)
+    star_query.create_all(engine)
+
+    builder = SparkSession.builder.appName("LoL star schema ETL").config("spark.jars", args.jars)
+    if args.master:
+        builder = builder.master(args.master)
+    spark = builder.getOrCreate()
+
+    properties = {
+        "user": args.user,
+        "password": args.password,
+        "driver": args.driver,
+        "batchsize": str(args.batch_size),
+        "numPartitions": str(args.partitions),
+    }
+
+    def write(frame, table):
+        if args.debug:
+            frame.show(5)
+        frame.write.jdbc(url=args.jdbc_url, table=table, mode="append", properties=properties)
+        print(f"[INFO] {table} written")
+
+    try:
+        with open(args.csv, newline='') as f:
+            header = next(csv.reader(f))
+        df = spark.read.option("header", True).schema(spark_schema(header)).csv(args.csv)
+        # Games that already have facts were loaded by an earlier run
+        loaded = read_table(spark, args.jdbc_url, properties,
+                            '(SELECT DISTINCT game_id AS gameId FROM fact_game_event) loaded_games')
+        df = with_team_id(df).join(loaded, on='gameId', how='left_anti') \
+            .repartition(args.partitions, "gameId").cache()
+        print(f"[INFO] Source rows not loaded yet: {df.count()}")
+
+        # Dimensions first because of the fact table foreign keys
+        write(build_dim_game(df, read_table(spark, args.jdbc_url, properties, 'dim_game')), 'dim_game')
+        write(build_dim_time(df, read_table(spark, args.jdbc_url, properties, 'dim_time')), 'dim_time')
+        write(build_dim_team(df, read_table(spark, args.jdbc_url, properties, 'dim_team')), 'dim_team')
+
+        present = df.agg(*[F.max(c).alias(c) for c in COUNTER_COLUMNS]).first()
+        for table, dimension, columns, key in [
+            ('dim_objective', 'objective', ['objective_name', 'category', 'type'], 'objective_tk'),
+            ('dim_structure', 'structure', ['structure_name', 'lane', 'structure_type'], 'structure_tk'),
+        ]:
+            existing = read_table(spark, args.jdbc_url, properties, table)
+            members = build_members(spark, present, existing, dimension, columns, key)
+            if members is not None:
+                write(members, table)
+
+        # Members loaded before keep their keys, the small dimensions are read back for the lookups
+        objectives = read_table(spark, args.jdbc_url, properties, 'dim_objective')
+        structures = read_table(spark, args.jdbc_url, properties, 'dim_structure')
+        write(build_fact(spark, df, objectives, structures), 'fact_game_event')
+        df.unpersist()
+
+        summary_tables.rebuild(engine)
+        print("[INFO] summary tables rebuilt")
+        # The JDBC writes cannot bump the versions in their transactions, done once after them
+        with engine.begin() as conn:
+            star_query.bump_versions(conn, star_query.STAR_TABLES)
+        print(" ETL complete: all rows inserted.")
+    finally:
+        spark.stop()
@@ -0,0 +1,115 @@
+from sqlalchemy import select
+
+
+class DimensionKeyCache:
+    """In-memory natural key -> surrogate key map for one dimension table.
+
+    The map is preloaded once, lookups are answered from memory and new members
+    are written in one executemany per flush instead of a SELECT/INSERT per row.
+
+    With allocate (natural -> surrogate key, see surrogate_keys.py) new members get
+    their key when they are added, nothing is read back from the database and the
+    caller may write the members itself together with its fact rows (take_pending).
+    """
+
+    def __init__(self, model, natural_key, surrogate_key=None, allocate=None):
+        self.table = model.__table__
+        self.natural_key = natural_key
+        self.surrogate_key = surrogate_key or natural_key
+        self.allocate = allocate
+        self.keys = {}
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+
+    def preload(self, conn):
+        natural = self.table.c[self.natural_key]
+        surrogate = self.table.c[self.surrogate_key]
+        self.keys = dict(conn.execute(select(natural, surrogate)).all())
+        return self
+
+    def seen(self, natural):
+        # True if the member is already in the dimension or queued for it
+        if natural in self.keys or natural in self.pending:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def unseen(self, naturals):
+        # Vectorized seen(): boolean mask of the values that are not members yet
+        mask = ~naturals.isin(list(self.keys) + list(self.pending))
+        misses = int(mask.sum())
+        self.misses += misses
+        self.hits += len(mask) - misses
+        return mask
+
+    def remember(self, natural, key=None):
+        # Used when the caller inserts the member itself (e.g. through the ORM)
+        self.keys[natural] = key
+
+    def remember_many(self, naturals, keys=None):
+        keys = naturals if keys is None else keys
+        self.keys.update(zip(naturals, keys))
+
+    def add(self, natural, **attrs):
+        if natural in self.keys or natural in self.pending:
+            return
+        member = {self.natural_key: natural, **attrs}
+        if self.allocate is not None:
+            key = self.allocate(natural)
+            used = set(self.keys.values()) | {m[self.surrogate_key] for m in self.pending.values()}
+            if key in used:
+                raise ValueError(f"{self.table.name}: key {key} of {natural!r} is already taken")
+            member[self.surrogate_key] = key
+        self.pending[natural] = member
+
+    def key(self, natural):
+        # Surrogate key of a member, also of a pending one when the keys are allocated here
+        if natural in self.keys:
+            return self.keys[natural]
+        return self.pending.get(natural, {}).get(self.surrogate_key)
+
+    def take_pending(self):
+        """Queued members with their allocated keys, for the caller to insert with its batch.
+        From now on they count as members."""
+        if self.allocate is None:
+            raise ValueError(f"{self.table.name}: keys are assigned by the database, use flush()")
+        members = list(self.pending.values())
+        self.keys.update((m[self.natural_key], m[self.surrogate_key]) for m in members)
+        self.pending.clear()
+        return members
+
+    def flush(self, conn):
+        # Writes all queued members at once, reads back their surrogate keys if the database assigned them
+        if not self.pending:
+            return
+        conn.execute(self.table.insert(), list(self.pending.values()))
+        if self.allocate is not None:
+            self.keys.update((m[self.natural_key], m[self.surrogate_key]) for m in self.pending.values())
+        else:
+            natural = self.table.c[self.natural_key]
+            surrogate = self.table.c[self.surrogate_key]
+            rows = conn.execute(select(natural, surrogate).where(natural.in_(list(self.pending))))
+            self.keys.update(rows.all())
+        self.pending.clear()
+        self.flushes += 1
+
+    def get_or_create(self, conn, natural, **attrs):
+        # An allocated key is known at once, the new member waits for the next flush() together
+        # with the other misses of the batch. A key assigned by the database needs the INSERT now.
+        if not self.seen(natural):
+            self.add(natural, **attrs)
+        if natural in self.pending and self.allocate is None:
+            self.flush(conn)
+        return self.key(natural)
+
+    def stats(self):
+        return {
+            'table': self.table.name,
+            'members': len(self.keys),
+            'hits': self.hits,
+            'misses': self.misses,
+            'flushes': self.flushes,
+        }
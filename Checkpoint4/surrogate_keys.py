@@ -0,0 +1,37 @@
+"""Surrogate keys assigned by the loaders instead of the database.
+
+Every key is a function of the natural key only, so any worker can compute it
+without asking the database, a chunk gets the same keys in every run and in every
+process, and the fact rows can be built before their dimension members are written:
+
+- dim_objective/dim_structure: CRC-32 of the member name, masked to a positive
+  31 bit INTEGER (Spark: crc32(name) & 0x7FFFFFFF gives the same key)
+- dim_team: one member per game and frame, game_id << 16 | frame (frames are
+  seconds, below 2^16 = 18 hours) in a BIGINT
+
+Members that are already in the database keep the key they have (the key caches
+preload them), only new members get a computed key.
+"""
+import zlib
+
+import numpy as np
+
+FRAME_BITS = 16
+NAME_KEY_MASK = 0x7FFFFFFF
+
+
+def name_key(name):
+    # zlib.crc32 does not depend on the process like hash() does
+    return zlib.crc32(name.encode('utf-8')) & NAME_KEY_MASK
+
+
+def team_keys(game_ids, frames):
+    """Vectorized dim_team keys of (game_id, frame) pairs."""
+    frames = np.asarray(frames, dtype=np.int64)
+    if frames.size and (frames.min() < 0 or frames.max() >= 1 << FRAME_BITS):
+        raise ValueError(f"frames must be in [0, {1 << FRAME_BITS}) to be part of a team key")
+    return (np.asarray(game_ids, dtype=np.int64) << FRAME_BITS) | frames
+
+
+def team_key(game_id, frame):
+    return int(team_keys([game_id], [frame])[0])
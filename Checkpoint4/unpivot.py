@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from common.schema import COUNTER_COLUMNS, COUNTER_MEMBERS
+from Checkpoint3.starshema import STATE_MEASURES
+
+
+class CounterDeltas:
+    """Turns the cumulative killed*/lost*/destroyed* counters into objective/structure events.
+
+    The CSV holds running totals per game and frame. Only counters that changed since
+    the previous frame of the same game (nonzero delta) become event rows, a frame
+    without changes adds nothing. Chunks must come in file order: the last row of a
+    chunk is kept to continue a game that is split over two chunks.
+    """
+
+    def __init__(self, columns=COUNTER_COLUMNS):
+        self.columns = list(columns)
+        self.last_game = None
+        self.last_counts = None
+
+    def events(self, df):
+        # Vectorized: (row positions, counter positions, deltas) of every nonzero delta
+        counts = df[self.columns].to_numpy(dtype=np.int16)
+        games = df['gameId'].to_numpy()
+        if not len(df):
+            return np.array([], dtype=np.intp), np.array([], dtype=np.intp), np.array([], dtype=np.int16)
+
+        previous = np.zeros_like(counts)
+        previous[1:] = counts[:-1]
+        new_game = np.ones(len(df), dtype=bool)
+        new_game[1:] = games[1:] != games[:-1]
+        previous[new_game] = 0
+        if games[0] == self.last_game:
+            previous[0] = self.last_counts
+        self.last_game, self.last_counts = games[-1], counts[-1]
+
+        deltas = counts - previous
+        rows, cols = np.nonzero(deltas)
+        return rows, cols, deltas[rows, cols]
+
+    def row_deltas(self, row):
+        # Same as events() for one CSV row as a dict, {counter: delta} of the nonzero deltas
+        counts = np.array([row[col] for col in self.columns], dtype=np.int16)
+        previous = self.last_counts if row['gameId'] == self.last_game else 0
+        self.last_game, self.last_counts = row['gameId'], counts
+        deltas = counts - previous
+        return {self.columns[i]: int(deltas[i]) for i in np.flatnonzero(deltas)}
+
+
+def member_attrs(column):
+    # Dimension attributes of a counter's member, as stored in dim_objective/dim_structure
+    dimension, name, category, member_type, lane = COUNTER_MEMBERS[column]
+    if dimension == 'objective':
+        return dimension, name, {'category': category, 'type': member_type}
+    return dimension, name, {'lane': lane, 'structure_type': member_type}
+
+
+def event_rows(fact, rows, cols, deltas, objective_keys, structure_keys):
+    """Fact rows of the events: the keys of the frame's state row with the member key and
+    delta, the measures of the frame stay on the state row (STATE_MEASURES are None).
+
+    objective_keys/structure_keys hold the surrogate key of every counter position
+    (None for counters of the other dimension).
+    """
+    events = fact.iloc[rows].copy()
+    events[STATE_MEASURES] = None
+    events['objective_tk'] = objective_keys[cols]
+    events['structure_tk'] = structure_keys[cols]
+    events['event_count'] = deltas.astype('int64')
+    return events
+
+
+def event_keys(state):
+    # Columns of a state row dict that an event row of the same frame repeats
+    return {col: value for col, value in state.items() if col not in STATE_MEASURES}
+
+
+def with_events(fact, events):
+    # Events follow the state row of their frame
+    return pd.concat([fact, events]).sort_index(kind='stable')
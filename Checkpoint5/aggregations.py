@@ -0,0 +1,325 @@
+"""Aggregation engine for the OLAP charts.
+
+The charts are described by a declarative list of specs. All specs are computed
+together in one pass over the data: every chunk is bucketed once per dimension and
+reduced with np.bincount into sum/count accumulators. The accumulators are additive,
+so the data can be streamed chunk by chunk and only the small results are kept.
+"""
+import os
+import sys
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.features import features_of, input_columns, bucket_codes, equal_width_edges
+
+
+@dataclass(frozen=True)
+class Dim:
+    """Grouping dimension of a Rate spec.
+
+    bins=None groups a flag column by value (False/True). A list of edges buckets
+    the column like pd.cut (right closed, values outside the edges are dropped).
+    An int gives pd.cut's equal width buckets over the observed range; those are
+    accumulated per distinct value and bucketed when the results are built.
+    """
+    column: str
+    bins: tuple = None
+    labels: tuple = None
+
+    def __post_init__(self):
+        # Lists are accepted for convenience, tuples keep the spec hashable
+        for name in ('bins', 'labels'):
+            value = getattr(self, name)
+            if isinstance(value, list):
+                object.__setattr__(self, name, tuple(value))
+
+    @property
+    def deferred(self):
+        return isinstance(self.bins, int)
+
+    @property
+    def size(self):
+        return 2 if self.bins is None else len(self.bins) - 1
+
+    def index(self):
+        if self.bins is None:
+            return pd.Index([False, True], name=self.column)
+        if self.labels is not None:
+            return pd.CategoricalIndex(self.labels, categories=self.labels, ordered=True, name=self.column)
+        return pd.IntervalIndex.from_breaks(self.bins, closed='right', name=self.column)
+
+    def codes(self, values):
+        # Bucket number per row, -1 for rows outside every bucket
+        values = np.asarray(values)
+        if self.bins is None:
+            return values.astype(np.int8)
+        return bucket_codes(values, self.bins)
+
+
+@dataclass(frozen=True)
+class Rate:
+    """Mean of the measures (win rate by default) per cell of the dimensions."""
+    name: str
+    dims: tuple
+    measures: tuple = ('hasWon',)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'dims', tuple(self.dims))
+        object.__setattr__(self, 'measures', tuple(self.measures))
+
+    @property
+    def columns(self):
+        return [dim.column for dim in self.dims] + list(self.measures)
+
+
+@dataclass(frozen=True)
+class Counts:
+    """Exact value counts of a discrete column, optionally split by a flag column."""
+    name: str
+    column: str
+    by: str = None
+
+    @property
+    def columns(self):
+        return [self.column] + ([self.by] if self.by else [])
+
+
+@dataclass(frozen=True)
+class Hist:
+    """Fixed edge histogram of a continuous column, optionally split by a flag column."""
+    name: str
+    column: str
+    bins: int
+    range: tuple
+    by: str = None
+
+    @property
+    def columns(self):
+        return [self.column] + ([self.by] if self.by else [])
+
+    def edges(self):
+        return np.linspace(self.range[0], self.range[1], self.bins + 1)
+
+
+@dataclass(frozen=True)
+class Corr:
+    """Pearson correlation matrix, accumulated from sums of (shifted) products."""
+    name: str
+    columns: tuple = field(default=())
+
+    def __post_init__(self):
+        object.__setattr__(self, 'columns', tuple(self.columns))
+
+
+class AggregationEngine:
+    def __init__(self, specs):
+        self.specs = list(specs)
+        self.state = {}
+        self.rows = 0
+
+    @property
+    def columns(self):
+        """Raw CSV columns needed by the specs (features replaced by their inputs)."""
+        return input_columns([col for spec in self.specs for col in spec.columns])
+
+    def update(self, chunk, weights=None):
+        """Adds a chunk. weights gives the number of rows each row stands for, e.g. the
+        event counts of pre-aggregated summary rows (fixed edge Rate specs only)."""
+        values = ChunkValues(chunk)
+        if weights is not None:
+            weights = np.asarray(weights, dtype='float64')
+            for spec in self.specs:
+                if not isinstance(spec, Rate) or any(dim.deferred for dim in spec.dims):
+                    raise ValueError(f"{spec.name}: weighted rows are only supported for fixed edge Rate specs")
+        for spec in self.specs:
+            if isinstance(spec, Rate):
+                self._update_rate(spec, values, weights)
+            elif isinstance(spec, Counts):
+                self._update_counts(spec, values)
+            elif isinstance(spec, Hist):
+                self._update_hist(spec, values)
+            elif isinstance(spec, Corr):
+                self._update_corr(spec, values)
+        self.rows += len(chunk)
+        return self
+
+    def _update_rate(self, spec, values, weights=None):
+        measures = np.column_stack([values[m].astype('float64') for m in spec.measures])
+        if any(dim.deferred for dim in spec.dims):
+            # Exact sums/counts per distinct value, bucketed in results()
+            keys = [values[dim.column] for dim in spec.dims]
+            frame = pd.DataFrame(measures, columns=list(spec.measures))
+            grouped = frame.groupby(keys).agg(['sum', 'count'])
+            old = self.state.get(spec.name)
+            self.state[spec.name] = grouped if old is None else old.add(grouped, fill_value=0)
+            return
+
+        codes = values.codes(spec.dims[0]).astype(np.int64)
+        valid = codes >= 0
+        shape = tuple(dim.size for dim in spec.dims)
+        for dim in spec.dims[1:]:
+            more = values.codes(dim)
+            valid &= more >= 0
+            codes = codes * dim.size + more
+        codes = codes[valid]
+        ncells = int(np.prod(shape))
+        if weights is None:
+            counts = np.bincount(codes, minlength=ncells)
+            sums = np.stack([np.bincount(codes, weights=measures[valid, i], minlength=ncells)
+                             for i in range(len(spec.measures))], axis=1)
+        else:
+            counts = np.bincount(codes, weights=weights[valid], minlength=ncells)
+            sums = np.stack([np.bincount(codes, weights=measures[valid, i] * weights[valid], minlength=ncells)
+                             for i in range(len(spec.measures))], axis=1)
+        old = self.state.get(spec.name)
+        if old is not None:
+            sums, counts = sums + old[0], counts + old[1]
+        self.state[spec.name] = (sums, counts)
+
+    def _update_counts(self, spec, values):
+        if spec.by:
+            frame = pd.DataFrame({spec.column: values[spec.column], spec.by: values[spec.by]})
+            counts = frame.value_counts(sort=False)
+        else:
+            counts = pd.Series(values[spec.column], name=spec.column).value_counts(sort=False)
+        old = self.state.get(spec.name)
+        self.state[spec.name] = counts if old is None else old.add(counts, fill_value=0)
+
+    def _update_hist(self, spec, values):
+        x = np.asarray(values[spec.column], dtype='float64')
+        edges = spec.edges()
+        if spec.by:
+            flag = np.asarray(values[spec.by], dtype=bool)
+            counts = np.stack([np.histogram(x[flag == v], bins=edges)[0] for v in (False, True)])
+        else:
+            counts = np.histogram(x, bins=edges)[0]
+        old = self.state.get(spec.name)
+        self.state[spec.name] = counts if old is None else old + counts
+
+    def _update_corr(self, spec, values):
+        x = np.column_stack([np.asarray(values[c], dtype='float64') for c in spec.columns])
+        old = self.state.get(spec.name)
+        # Shifting by the first chunk's mean keeps the sums of squares well conditioned
+        shift = x.mean(axis=0) if old is None else old['shift']
+        x = x - shift
+        n, s, ss = len(x), x.sum(axis=0), x.T @ x
+        if old is not None:
+            n, s, ss = n + old['n'], s + old['s'], ss + old['ss']
+        self.state[spec.name] = {'shift': shift, 'n': n, 's': s, 'ss': ss}
+
+    def results(self):
+        results = {}
+        for spec in self.specs:
+            state = self.state.get(spec.name)
+            if isinstance(spec, Rate):
+                results[spec.name] = rate_result(spec, state)
+            elif isinstance(spec, Counts):
+                results[spec.name] = counts_result(spec, state)
+            elif isinstance(spec, Hist):
+                results[spec.name] = {'edges': spec.edges(), 'counts': state}
+            elif isinstance(spec, Corr):
+                results[spec.name] = corr_result(spec, state)
+        return results
+
+
+class ChunkValues:
+    """Column access for one chunk, features (common.features) and bucket codes are computed once."""
+
+    def __init__(self, chunk):
+        self.features = features_of(chunk)
+        self.bucket_codes = {}
+
+    def __getitem__(self, column):
+        return self.features[column]
+
+    def codes(self, dim):
+        if dim not in self.bucket_codes:
+            self.bucket_codes[dim] = dim.codes(self[dim.column])
+        return self.bucket_codes[dim]
+
+
+def rate_result(spec, state):
+    if any(dim.deferred for dim in spec.dims):
+        return deferred_rate_result(spec, state)
+    sums, counts = state
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts[:, None]
+    if len(spec.dims) == 1:
+        index = spec.dims[0].index()
+        if len(spec.measures) == 1:
+            return pd.Series(means[:, 0], index=index, name=spec.measures[0])
+        return pd.DataFrame(means, index=index, columns=list(spec.measures))
+    # Two dimensions: first one on the rows, second one on the columns
+    first, second = spec.dims[:2]
+    return pd.DataFrame(means[:, 0].reshape(first.size, second.size),
+                        index=first.index(), columns=second.index())
+
+
+def deferred_rate_result(spec, grouped):
+    if len(spec.dims) != 1:
+        raise ValueError(f"{spec.name}: equal width bins are only supported for one dimension")
+    dim = spec.dims[0]
+    values = grouped.index.to_numpy(dtype='float64')
+    # Edges of pd.cut(bins=n) only depend on min/max, so bucketing the distinct values is exact
+    edges = equal_width_edges(values, dim.bins)
+    # pd.cut of no values only formats the bucket labels
+    categories = pd.cut(np.array([]), bins=edges, labels=dim.labels).categories
+    buckets = pd.Categorical.from_codes(bucket_codes(values, edges), categories=categories, ordered=True)
+    totals = grouped.groupby(buckets, observed=False).sum()
+    means = pd.DataFrame({m: totals[(m, 'sum')] / totals[(m, 'count')] for m in spec.measures})
+    means.index.name = dim.column
+    return means[spec.measures[0]] if len(spec.measures) == 1 else means
+
+
+def counts_result(spec, counts):
+    counts = counts.astype('int64')
+    if spec.by:
+        return counts.unstack(fill_value=0).sort_index().sort_index(axis=1)
+    return counts.sort_index()
+
+
+def corr_result(spec, state):
+    n, s, ss = state['n'], state['s'], state['ss']
+    cov = ss - np.outer(s, s) / n
+    std = np.sqrt(np.diag(cov))
+    corr = cov / np.outer(std, std)
+    return pd.DataFrame(corr, index=list(spec.columns), columns=list(spec.columns))
+
+
+def aggregate(chunks, specs):
+    """Runs all specs over an iterable of DataFrame chunks in one pass."""
+    engine = AggregationEngine(specs)
+    for chunk in chunks:
+        engine.update(chunk)
+    return engine.results()
+
+
+def weighted_percentile(values, counts, q):
+    # np.percentile (linear) of the data where every value is repeated counts times
+    cum = np.cumsum(counts)
+    pos = q / 100 * (cum[-1] - 1)
+    lo, hi = int(np.floor(pos)), int(np.ceil(pos))
+    v_lo = values[np.searchsorted(cum, lo, side='right')]
+    v_hi = values[np.searchsorted(cum, hi, side='right')]
+    return v_lo + (v_hi - v_lo) * (pos - lo)
+
+
+def box_stats(counts, label=None, whis=1.5):
+    """matplotlib bxp() stats from value counts, same numbers as boxplot() on the raw data."""
+    counts = counts[counts > 0]
+    values = counts.index.to_numpy(dtype='float64')
+    weights = counts.to_numpy()
+    q1, med, q3 = (weighted_percentile(values, weights, q) for q in (25, 50, 75))
+    iqr = q3 - q1
+    inside = values[(values >= q1 - whis * iqr) & (values <= q3 + whis * iqr)]
+    whislo, whishi = inside.min(), inside.max()
+    return {
+        'label': label,
+        'mean': np.average(values, weights=weights),
+        'med': med, 'q1': q1, 'q3': q3,
+        'whislo': whislo, 'whishi': whishi,
+        'fliers': values[(values < whislo) | (values > whishi)],
+    }
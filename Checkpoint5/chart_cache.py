@@ -0,0 +1,113 @@
+"""Content addressed cache for chart aggregates and rendered PDFs.
+
+Keys are hashes of everything an entry depends on: the fingerprint of the source
+data plus the spec definitions (bucket edges, labels, measures) and, for charts,
+the source of the module of the render function and of the local modules it takes
+helpers from (charts.py with its style constants, box_stats of aggregations.py).
+Changing any of them gives a new key, so only
+the affected charts are recomputed. The cache is trimmed to max_bytes by evicting
+the least recently used entries.
+"""
+import hashlib
+import inspect
+import os
+import pickle
+import shutil
+
+
+def render_sources(render_chart):
+    # Source of the render function's module and of the modules next to it that it imports from
+    module = inspect.getmodule(render_chart)
+    directory = os.path.dirname(os.path.abspath(module.__file__))
+    modules = {module.__name__: module}
+    for value in vars(module).values():
+        dependency = value if inspect.ismodule(value) else inspect.getmodule(value)
+        path = getattr(dependency, '__file__', None)
+        if path and os.path.dirname(os.path.abspath(path)) == directory:
+            modules[dependency.__name__] = dependency
+    return [inspect.getsource(modules[name]) for name in sorted(modules)]
+
+
+class ContentCache:
+    def __init__(self, root, max_bytes=512 * 2**20):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.stats = {'aggregate_hits': 0, 'aggregate_misses': 0, 'chart_hits': 0, 'chart_misses': 0, 'evicted': 0}
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        sha1 = hashlib.sha1()
+        for part in parts:
+            sha1.update(repr(part).encode())
+            sha1.update(b'\0')
+        return sha1.hexdigest()
+
+    def spec_key(self, data_fingerprint, spec):
+        # Specs are frozen dataclasses, their repr lists every bucket definition
+        return self.key(data_fingerprint, spec)
+
+    def chart_key(self, data_fingerprint, specs, render_chart):
+        return self.key(data_fingerprint, *specs, *render_sources(render_chart))
+
+    def _path(self, key, ext):
+        return os.path.join(self.root, key[:2], key + ext)
+
+    def _touch(self, path):
+        # mtime is the LRU clock
+        os.utime(path)
+
+    def get_result(self, key):
+        path = self._path(key, '.pkl')
+        if not os.path.exists(path):
+            self.stats['aggregate_misses'] += 1
+            return None
+        self.stats['aggregate_hits'] += 1
+        self._touch(path)
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def put_result(self, key, result):
+        path = self._path(key, '.pkl')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+
+    def get_file(self, key, dest):
+        """Copies the cached file to dest, returns False on a miss."""
+        path = self._path(key, '.pdf')
+        if not os.path.exists(path):
+            self.stats['chart_misses'] += 1
+            return False
+        self.stats['chart_hits'] += 1
+        self._touch(path)
+        shutil.copyfile(path, dest)
+        return True
+
+    def put_file(self, key, src):
+        path = self._path(key, '.pdf')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(src, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def evict(self):
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            self.stats['evicted'] += 1
+        return total
+
+    def report(self):
+        s = self.stats
+        return (f"aggregates {s['aggregate_hits']} hits / {s['aggregate_misses']} misses, "
+                f"charts {s['chart_hits']} hits / {s['chart_misses']} misses, {s['evicted']} evicted")
@@ -0,0 +1,400 @@
+"""Chart registry for the OLAP analysis.
+
+Every chart is a job: the aggregate specs it needs plus a function that only
+draws the precomputed results. render() saves the figure as <plot_dir>/<name>.pdf.
+Jobs can be rendered in the main process or in a process pool with the Agg backend.
+"""
+import matplotlib
+import matplotlib.pyplot as plt # type: ignore
+import seaborn as sns # type: ignore
+import numpy as np
+
+from aggregations import Rate, Counts, Hist, Corr, Dim, box_stats
+
+# name -> (specs, render function)
+CHARTS = {}
+
+
+def chart(name, *specs):
+    def register(render):
+        CHARTS[name] = (specs, render)
+        return render
+    return register
+
+
+def specs_for(names):
+    # Specs of the selected charts, shared specs (same name) are computed once
+    specs = {}
+    for name in names:
+        for spec in CHARTS[name][0]:
+            specs.setdefault(spec.name, spec)
+    return list(specs.values())
+
+
+def chart_path(plot_dir, name):
+    return f"{plot_dir}/{name}.pdf"
+
+
+def render(name, results, plot_dir, show=False):
+    """Renders one chart from its results only, returns the chart name."""
+    specs, render_chart = CHARTS[name]
+    fig = render_chart({spec.name: results[spec.name] for spec in specs})
+    fig.savefig(chart_path(plot_dir, name), format='pdf')
+    if show:
+        plt.show()
+    else:
+        plt.close(fig)
+    return name
+
+
+def init_worker():
+    # Pool workers never open windows
+    matplotlib.use('Agg')
+
+
+def hist_from_counts(counts, **kwargs):
+    # plt.hist of the raw values, drawn from their value counts
+    plt.hist(counts.index.to_numpy(dtype='float64'), weights=counts.to_numpy(), **kwargs)
+
+
+# -------------------
+# Aggregation definitions
+# -------------------
+diff_bins = [-10000, -5000, -2000, 0, 2000, 5000, 10000]
+diff_labels = ['<<-5k', '-5k to -2k', '-2k to 0', '0 to +2k', '+2k to +5k', '>>+5k']
+kda_dim = Dim('kda', bins=[-1, 1, 2, 3, 4, 5, 10, 20],
+              labels=['<1', '1-2', '2-3', '3-4', '4-5', '5-10', '10+'])
+wards_dim = Dim('wardsPlaced', bins=[-1, 5, 10, 15, 20, 30, 50, 100],
+                labels=['0-5', '6-10', '11-15', '16-20', '21-30', '31-50', '51+'])
+
+objectives = ['killedFireDrake', 'killedBaronNashor', 'killedRiftHerald', 'destroyedTopInhibitor']
+dragon_cols = ['killedFireDrake', 'killedWaterDrake', 'killedAirDrake',
+               'killedEarthDrake', 'killedElderDrake']
+lost_obj_cols = ['lostFireDrake', 'lostWaterDrake', 'lostAirDrake', 'lostEarthDrake', 'lostElderDrake', 'lostBaronNashor']
+lost_inhib_cols = ['lostTopInhibitor', 'lostMidInhibitor', 'lostBotInhibitor']
+numerical_cols = ['gameDuration', 'goldDiff', 'expDiff', 'champLevelDiff', 'kills', 'deaths', 'assists',
+                  'wardsPlaced', 'wardsDestroyed', 'wardsLost', 'kill_participation', 'kda', 'total_turrets_destroyed']
+
+duration_counts = Counts('duration_counts', 'gameDuration', by='hasWon')
+
+
+# -------------------
+# 1. Gold Diff vs Win Rate
+# -------------------
+@chart('win_rate_by_gold_diff', Rate('gold_win_rate', [Dim('goldDiff', diff_bins, diff_labels)]))
+def win_rate_by_gold_diff(r):
+    fig = plt.figure(figsize=(8, 5))
+    r['gold_win_rate'].plot(kind='bar', color='skyblue')
+    plt.title("Win Rate by Gold Difference")
+    plt.xlabel("Gold Difference Buckets")
+    plt.ylabel("Win Rate")
+    plt.grid(True)
+    plt.tight_layout()
+    return fig
+
+
+# -------------------
+# 2. Game Duration Distribution
+# -------------------
+@chart('game_duration_distribution', duration_counts)
+def game_duration_distribution(r):
+    fig = plt.figure(figsize=(10, 5))
+    hist_from_counts(r['duration_counts'][True], bins=30, alpha=0.6, label='Win', color='green')
+    hist_from_counts(r['duration_counts'][False], bins=30, alpha=0.6, label='Loss', color='red')
+    plt.legend()
+    plt.title("Game Duration Distribution (Win vs Loss)")
+    plt.xlabel("Game Duration (seconds)")
+    plt.ylabel("Frequency")
+    plt.grid(True)
+    plt.tight_layout()
+    return fig
+
+
+# -------------------
+# 3. Objectives vs Win Rate
+# -------------------
+@chart('avg_obj_per_game', Rate('avg_objectives', [Dim('hasWon')], objectives))
+def avg_obj_per_game(r):
+    fig = plt.figure(figsize=(10, 6))
+    r['avg_objectives'].T.plot(kind='bar', ax=plt.gca())
+    plt.title("Average Objectives per Game (Win vs Loss)")
+    plt.ylabel("Average Count")
+    plt.xlabel("Objective")
+    plt.legend(['Loss', 'Win'])
+    plt.grid(True)
+    plt.tight_layout()
+    return fig
+
+
+# -------------------
+# 4. KDA Distributions
+# -------------------
+@chart('KDA_dist', *[Counts(f'{stat}_counts', stat, by='hasWon') for stat in ['kills', 'deaths', 'assists']])
+def kda_dist(r):
+    fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+
+    for ax, stat in zip(axes, ['kills', 'deaths', 'assists']):
+        counts = r[f'{stat}_counts']
+        ax.bxp([box_stats(counts[outcome], label=str(int(outcome))) for outcome in (False, True)])
+        ax.set_title(f"{stat.capitalize()} by Win/Loss")
+        ax.set_xlabel("Has Won")
+        ax.set_ylabel(stat.capitalize())
+
+    plt.suptitle("KDA Distributions by Outcome")
+    plt.tight_layout()
+    return fig
+
+
+# -------------------
+# 5. First Blood & First Tower
+# -------------------
+@chart('Win_rate_FB', Rate('early_events', [Dim('isFirstBlood'), Dim('isFirstTower')]))
+def win_rate_fb(r):
+    fig = plt.figure(figsize=(8, 5))
+    r['early_events'].plot(kind='bar', colormap='coolwarm', ax=plt.gca())
+    plt.title("Win Rate by First Blood and Tower")
+    plt.ylabel("Win Rate")
+    plt.xlabel("First Blood")
+    plt.xticks([0, 1], ['No', 'Yes'], rotation=0)
+    plt.grid(True)
+    plt.tight_layout()
+    return fig
+
+
+# -------------------
+# 6. Wards Placed vs Win Rate
+# -------------------
+@chart('wards_vs_wins', Rate('vision_win_rate', [Dim('wardsPlaced', bins=10)]))
+def wards_vs_wins(r):
+    fig = plt.figure(figsize=(10, 5))
+    r['vision_win_rate'].plot(kind='line', marker='o')
+    plt.title("Win Rate by Wards Placed")
+    plt.xlabel("Wards Placed (Binned)")
+    plt.ylabel("Win Rate")
+    plt.grid(True)
+    plt.tight_layout()
+    return fig
+
+
+# -------------------
+# 7. Kill Participation
+# -------------------
+@chart('kill_participation', Hist('kill_participation_hist', 'kill_participation', bins=30, range=(0, 2), by='hasWon'))
+def kill_participation(r):
+    edges = r['kill_participation_hist']['edges']
+    counts = r['kill_participation_hist']['counts']
+
+    fig = plt.figure(figsize=(10, 5))
+    plt.hist(edges[:-1], bins=edges, weights=counts[1], alpha=0.5, label='Win')
+    plt.hist(edges[:-1], bins=edges, weights=counts[0], alpha=0.5, label='Loss')
+    plt.title("Kill Participation by Outcome")
+    plt.xlabel("Kill Participation Ratio")
+    plt.ylabel("Frequency")
+    plt.legend()
+    plt.tight_layout()
+    return fig
+
+
+@chart('first_tower_blood', Rate('tower_win_rate', [Dim('isFirstTower')]), Rate('blood_win_rate', [Dim('isFirstBlood')]))
+def first_tower_blood(r):
+    fig, ax = plt.subplots(1, 2, figsize=(14, 5))
+
+    # First Tower
+    ax[0].bar(['No First Tower', 'Got First Tower'], r['tower_win_rate'], color=['gray', 'green'])
+    ax[0].set_title('Win Rate vs First Tower')
+    ax[0].set_ylabel('Win Rate')
+    ax[0].set_ylim(0, 1)
+
+    # First Blood
+    ax[1].bar(['No First Blood', 'Got First Blood'], r['blood_win_rate'], color=['gray', 'red'])
+    ax[1].set_title('Win Rate vs First Blood')
+    ax[1].set_ylim(0, 1)
+
+    plt.tight_layout()
+    return fig
+
+
+@chart('win_vs_dragon', *[Rate(f'{dragon}_win_rate', [Dim(dragon, bins=[0, np.inf])]) for dragon in dragon_cols])
+def win_vs_dragon(r):
+    dragon_win_rates = {
+        dragon: r[f'{dragon}_win_rate'].iloc[0] for dragon in dragon_cols
+    }
+
+    fig = plt.figure(figsize=(8, 5))
+    plt.bar(dragon_win_rates.keys(), dragon_win_rates.values(), color='orange')
+    plt.title('Win Rate vs Dragon Type Taken')
+    plt.ylabel('Win Rate')
+    plt.ylim(0, 1)
+    plt.xticks(rotation=45)
+    plt.grid(axis='y', linestyle='--')
+    return fig
+
+
+@chart('win_vs_KDA', Rate('kda_win_rate', [kda_dim]))
+def win_vs_kda(r):
+    fig = plt.figure(figsize=(8, 5))
+    r['kda_win_rate'].plot(kind='bar', color='purple')
+    plt.title('Win Rate vs KDA Bucket')
+    plt.ylabel('Win Rate')
+    plt.xlabel('KDA')
+    plt.ylim(0, 1)
+    plt.grid(axis='y')
+    return fig
+
+
+@chart('distibution_durations', duration_counts)
+def distribution_durations(r):
+    all_durations = r['duration_counts'].sum(axis=1)
+
+    fig = plt.figure(figsize=(8, 5))
+    plt.hist(all_durations.index / 60, weights=all_durations.to_numpy(), bins=20, color='steelblue', edgecolor='black')
+    plt.title('Distribution of Game Durations')
+    plt.xlabel('Game Duration (minutes)')
+    plt.ylabel('Number of Games')
+    plt.grid(axis='y')
+    return fig
+
+
+@chart('win_vs_wards', Rate('ward_win_rate', [wards_dim]))
+def win_vs_wards(r):
+    fig = plt.figure(figsize=(8, 5))
+    r['ward_win_rate'].plot(kind='bar', color='olive')
+    plt.title('Win Rate vs Wards Placed')
+    plt.ylabel('Win Rate')
+    plt.xlabel('Wards Placed Bucket')
+    plt.ylim(0, 1)
+    plt.grid(axis='y')
+    return fig
+
+
+@chart('wis_vs_KDA_Vision', Rate('kda_vision_win_rate', [kda_dim, wards_dim]))
+def kda_vision(r):
+    # Same as pd.pivot_table: buckets without any games are left out
+    pivot_kda_vision = r['kda_vision_win_rate'].dropna(how='all').dropna(axis=1, how='all')
+
+    fig = plt.figure(figsize=(10, 6))
+    sns.heatmap(pivot_kda_vision, annot=True, fmt='.2f', cmap='YlGnBu')
+    plt.title("Pivot: Win Rate by KDA and Vision")
+    plt.ylabel("KDA Bucket")
+    plt.xlabel("Wards Placed Bucket")
+    plt.tight_layout()
+    return fig
+
+
+# ====================
+# Additional Analysis Enhancements
+# ====================
+
+# 1. EXP Diff vs Win Rate
+@chart('win_vs_experiance', Rate('exp_win_rate', [Dim('expDiff', diff_bins, diff_labels)]))
+def win_vs_experience(r):
+    fig = plt.figure(figsize=(8,5))
+    r['exp_win_rate'].plot(kind='bar', color='teal')
+    plt.title("Win Rate by Experience Difference")
+    plt.xlabel("Experience Difference Buckets")
+    plt.ylabel("Win Rate")
+    plt.grid(True)
+    plt.tight_layout()
+    return fig
+
+
+# 2. Champion Level Difference Impact
+@chart('champions_level_diff', Counts('champ_level_counts', 'champLevelDiff', by='hasWon'))
+def champions_level_diff(r):
+    counts = r['champ_level_counts']
+
+    fig = plt.figure(figsize=(8,5))
+    boxes = plt.gca().bxp([box_stats(counts[outcome], label=str(int(outcome))) for outcome in (False, True)],
+                          patch_artist=True)
+    for patch, color in zip(boxes['boxes'], ['red', 'green']):
+        patch.set_facecolor(color)
+    plt.title("Champion Level Difference Distribution by Win/Loss")
+    plt.xlabel("Has Won")
+    plt.ylabel("Champion Level Difference")
+    plt.tight_layout()
+    return fig
+
+
+# 3. Impact of Losing Objectives on Win Rate (e.g. lostBaronNashor, lostElderDrake)
+@chart('avg_lost_obj', Rate('lost_objectives', [Dim('hasWon')], lost_obj_cols))
+def avg_lost_obj(r):
+    fig = plt.figure(figsize=(10,6))
+    r['lost_objectives'].T.plot(kind='bar', stacked=False, ax=plt.gca())
+    plt.title("Average Lost Objectives per Game (Win vs Loss)")
+    plt.ylabel("Average Count")
+    plt.xlabel("Lost Objective")
+    plt.legend(['Loss', 'Win'])
+    plt.grid(True)
+    plt.tight_layout()
+    return fig
+
+
+# 4. Turret Destruction Impact: Total Turrets Destroyed vs Win Rate
+@chart('win_vs_turrets', Rate('turret_win_rate', [Dim('total_turrets_destroyed', [0, 1, 3, 5, 8, 12],
+                                                      ['1', '2-3', '4-5', '6-8', '9-12'])]))
+def win_vs_turrets(r):
+    fig = plt.figure(figsize=(8,5))
+    r['turret_win_rate'].plot(kind='bar', color='coral')
+    plt.title("Win Rate by Number of Turrets Destroyed")
+    plt.xlabel("Turrets Destroyed")
+    plt.ylabel("Win Rate")
+    plt.ylim(0,1)
+    plt.grid(True)
+    plt.tight_layout()
+    return fig
+
+
+# 5. Deaths vs Win Rate (Binned)
+@chart('win_rate_death_count', Rate('death_win_rate', [Dim('deaths', [-1, 1, 3, 5, 10, 20],
+                                                           ['0-1', '2-3', '4-5', '6-10', '10+'])]))
+def win_rate_death_count(r):
+    fig = plt.figure(figsize=(8,5))
+    r['death_win_rate'].plot(kind='bar', color='brown')
+    plt.title("Win Rate by Death Count Bucket")
+    plt.xlabel("Deaths")
+    plt.ylabel("Win Rate")
+    plt.ylim(0,1)
+    plt.grid(True)
+    plt.tight_layout()
+    return fig
+
+
+# 6. Correlation Heatmap (Numerical Features Only)
+@chart('correlation', Corr('correlation', numerical_cols + ['hasWon']))
+def correlation(r):
+    fig = plt.figure(figsize=(12,10))
+    sns.heatmap(r['correlation'], annot=True, cmap='coolwarm', fmt='.2f', square=True, cbar_kws={'shrink':.8})
+    plt.title("Correlation Heatmap of Key Features")
+    plt.tight_layout()
+    return fig
+
+
+# 7. Impact of Lost Inhibitors on Win Rate
+@chart('Lost_inhibitors', Rate('lost_inhibitors', [Dim('hasWon')], lost_inhib_cols))
+def lost_inhibitors(r):
+    fig = plt.figure(figsize=(8,5))
+    r['lost_inhibitors'].T.plot(kind='bar', stacked=False, ax=plt.gca())
+    plt.title("Average Lost Inhibitors per Game (Win vs Loss)")
+    plt.xlabel("Lost Inhibitor")
+    plt.ylabel("Average Count")
+    plt.legend(['Loss', 'Win'])
+    plt.grid(True)
+    plt.tight_layout()
+    return fig
+
+
+# 8. Assist to Death Ratio Distribution by Win/Loss
+@chart('AD_ratio', Counts('assist_death_counts', 'assist_death_ratio', by='hasWon'))
+def ad_ratio(r):
+    # The density is estimated from the distinct ratios weighted by how often they occur
+    ad_counts = r['assist_death_counts']
+
+    fig = plt.figure(figsize=(10,5))
+    sns.kdeplot(x=ad_counts.index, weights=ad_counts[True], label='Win', fill=True, color='green', alpha=0.5)
+    sns.kdeplot(x=ad_counts.index, weights=ad_counts[False], label='Loss', fill=True, color='red', alpha=0.5)
+    plt.title("Assist to Death Ratio Density by Outcome")
+    plt.xlabel("Assist/Death Ratio")
+    plt.xlim(0, 10)
+    plt.legend()
+    plt.tight_layout()
+    return fig
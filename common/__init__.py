@@ -0,0 +1 @@
+# Shared helpers for the checkpoint scripts (CSV reading, ...)
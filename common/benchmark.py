@@ -0,0 +1,158 @@
+"""Benchmark of the pipelines on synthetic data (common.synthetic) against SQLite.
+
+For every scale a synthetic CSV is generated once (reused while it exists) and each
+pipeline is run as its own process with --report, so the peak RSS in the report is
+the one of that pipeline only:
+
+- spi: Checkpoint2/spi.py, normalized schema
+- etl_fake: Checkpoint4/etl_fake.py --mode bulk, star schema with summaries
+- etl_spark: Checkpoint4/etl_spark.py local[*] over the SQLite JDBC driver
+  (only with --sqlite-jar and pyspark installed, skipped otherwise)
+- graphs: Checkpoint5/graphs.py --no-show --no-cache, aggregation and rendering, with an
+  explicit --data-format. The on-disk copy of the CSV (Parquet cache or column store) is
+  built before the timed run, or removed with --cold-cache so the run includes the
+  build; the state is recorded as data_cache (warm/cold) in the result line
+
+One JSON line per pipeline and scale is appended to the results file, with the
+git commit of the tree so runs can be compared:
+
+    python -m common.benchmark --rows 10000 100000 --results benchmark_results.jsonl
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import shutil
+import time
+from datetime import datetime
+
+from common import column_store, parquet_cache
+from common.synthetic import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PIPELINES = ['spi', 'etl_fake', 'etl_spark', 'graphs']
+# --data-format of graphs.py -> (cache_dir_for, ensure) of its on-disk copy of the CSV
+DATA_CACHES = {
+    'parquet': (parquet_cache.cache_dir_for, parquet_cache.ensure_cache),
+    'columns': (column_store.cache_dir_for, column_store.ensure_store),
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset(work_dir, rows, seed):
+    path = os.path.join(work_dir, f'lol_synthetic_{rows}_{seed}.csv')
+    if not os.path.exists(path):
+        print(f"[INFO] generating {path}")
+        generate(path, rows, seed)
+    return path
+
+
+def sqlite_file(work_dir, name):
+    path = os.path.join(work_dir, f'{name}.db')
+    if os.path.exists(path):
+        os.remove(path)
+    return path
+
+
+def command(pipeline, csv_path, work_dir, tag, args):
+    """Command line of one pipeline run, None when it cannot run here."""
+    script = {
+        'spi': 'Checkpoint2/spi.py',
+        'etl_fake': 'Checkpoint4/etl_fake.py',
+        'etl_spark': 'Checkpoint4/etl_spark.py',
+        'graphs': 'Checkpoint5/graphs.py',
+    }[pipeline]
+    cmd = [sys.executable, os.path.join(ROOT, script), '--csv', csv_path]
+    if pipeline == 'spi':
+        return cmd + ['--db-url', f'sqlite:///{sqlite_file(work_dir, tag)}', '--method', 'native']
+    if pipeline == 'etl_fake':
+        return cmd + ['--db-url', f'sqlite:///{sqlite_file(work_dir, tag)}']
+    if pipeline == 'etl_spark':
+        if not args.sqlite_jar or importlib.util.find_spec('pyspark') is None:
+            return None
+        return cmd + ['--master', 'local[*]', '--jars', args.sqlite_jar, '--driver', 'org.sqlite.JDBC',
+                      '--jdbc-url', f'jdbc:sqlite:{sqlite_file(work_dir, tag)}', '--partitions', '1']
+    return cmd + ['--no-show', '--no-cache', '--plot-dir', os.path.join(work_dir, 'plots'),
+                  '--data-format', args.data_format]
+
+
+def prepare_data_cache(csv_path, args):
+    """Builds (warm) or removes (cold) the on-disk copy of the CSV that graphs.py reads,
+    so the timed run does or does not include the build whatever the previous runs left."""
+    cache_dir_for, ensure = DATA_CACHES[args.data_format]
+    if args.cold_cache:
+        shutil.rmtree(cache_dir_for(csv_path), ignore_errors=True)
+        return 'cold'
+    ensure(csv_path)
+    return 'warm'
+
+
+def run(pipeline, rows, csv_path, work_dir, args):
+    tag = f'{pipeline}_{rows}'
+    report_path = os.path.join(work_dir, f'{tag}.json')
+    result = {'pipeline': pipeline, 'rows': rows, 'seed': args.seed, 'commit': git_commit(),
+              'started': datetime.now().isoformat(timespec='seconds')}
+    cmd = command(pipeline, csv_path, work_dir, tag, args)
+    if cmd is None:
+        print(f"[INFO] {pipeline}: skipped (needs pyspark and --sqlite-jar)")
+        return dict(result, status='skipped')
+    if pipeline == 'graphs':
+        result.update(data_format=args.data_format, data_cache=prepare_data_cache(csv_path, args))
+
+    if os.path.exists(report_path):
+        os.remove(report_path)
+    start = time.perf_counter()
+    process = subprocess.run(cmd + ['--report', report_path], cwd=os.path.dirname(cmd[1]),
+                             capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if process.returncode != 0 or not os.path.exists(report_path):
+        print(f"[INFO] {pipeline}: failed\n{process.stdout[-2000:]}{process.stderr[-2000:]}")
+        return dict(result, status='failed', seconds=seconds)
+
+    with open(report_path) as f:
+        report = json.load(f)
+    # Whole games are generated, so the file has a few rows more than requested
+    rows = report['rows'] or rows
+    # Process time includes interpreter start and imports, wall_seconds of the report does not
+    result.update(status='ok', seconds=seconds, wall_seconds=report['wall_seconds'], source_rows=rows,
+                  rows_per_second=rows / report['wall_seconds'], peak_rss_mb=report['peak_rss_mb'],
+                  sql_statements=report['sql_statements'], commits=report['commits'],
+                  stages={name: stage['seconds'] for name, stage in report['stages'].items()})
+    print(f"[INFO] {pipeline:<9} {rows:>9} rows: {report['wall_seconds']:8.2f}s "
+          f"({result['rows_per_second']:,.0f} rows/s), peak RSS {report['peak_rss_mb'] or 0:.0f} MB")
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of the pipelines on synthetic data (SQLite)')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pipelines', nargs='+', choices=PIPELINES, default=PIPELINES)
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'lol_benchmark'),
+                        help='synthetic CSVs, databases and reports')
+    parser.add_argument('--sqlite-jar', default=None, help='sqlite-jdbc jar for the etl_spark run')
+    parser.add_argument('--data-format', choices=list(DATA_CACHES), default='parquet',
+                        help='--data-format of the graphs run')
+    parser.add_argument('--cold-cache', action='store_true',
+                        help='time the graphs run from a removed data cache (build included) instead of a built one')
+    parser.add_argument('--results', default='benchmark_results.jsonl', help='one JSON line per run is appended')
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    with open(args.results, 'a') as results:
+        for rows in args.rows:
+            csv_path = dataset(args.work_dir, rows, args.seed)
+            for pipeline in args.pipelines:
+                results.write(json.dumps(run(pipeline, rows, csv_path, args.work_dir, args)) + '\n')
+                results.flush()
+    print(f"[INFO] results appended to {args.results}")
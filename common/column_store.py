@@ -0,0 +1,108 @@
+"""Memory mapped binary column store of lol_ranked_games.csv.
+
+The CSV is converted once into one raw file per column (<csv name>.columns/<column>.bin,
+the values in the schema dtype one after the other) and a JSON manifest with the
+dtypes and the row count. Loads np.memmap the files and wrap them in a DataFrame
+without copying, so opening the dataset costs no parsing and every process that
+reads it shares the same OS page cache instead of holding a private copy.
+Freshness is checked like the Parquet cache (mtime/size, confirmed by hash).
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from common.reader import CHUNK_SIZE, iter_chunks
+from common.parquet_cache import MANIFEST, file_hash, source_info, read_manifest, is_fresh
+
+
+def cache_dir_for(csv_path):
+    return os.path.splitext(csv_path)[0] + '.columns'
+
+
+def column_path(cache_dir, column):
+    return os.path.join(cache_dir, f'{column}.bin')
+
+
+def build_store(csv_path, cache_dir=None, chunksize=CHUNK_SIZE):
+    """Appends every typed chunk of the CSV to the column files."""
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    tmp_dir = cache_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    rows = 0
+    dtypes = None
+    files = {}
+    try:
+        for chunk in iter_chunks(csv_path, chunksize):
+            if dtypes is None:
+                dtypes = {col: chunk[col].dtype.str for col in chunk.columns}
+                files = {col: open(column_path(tmp_dir, col), 'wb') for col in chunk.columns}
+            for col, f in files.items():
+                np.ascontiguousarray(chunk[col].to_numpy(dtype=dtypes[col])).tofile(f)
+            rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    manifest = dict(source_info(csv_path), sha1=file_hash(csv_path), rows=rows, columns=dtypes or {})
+    with open(os.path.join(tmp_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap in the finished store so readers never see a half written one
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    return cache_dir
+
+
+def ensure_store(csv_path, cache_dir=None):
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    if not is_fresh(csv_path, cache_dir):
+        print(f"[INFO] Building column store {cache_dir}")
+        build_store(csv_path, cache_dir)
+    return cache_dir
+
+
+def fingerprint(csv_path, cache_dir=None):
+    """Content hash of the source CSV, taken from the store manifest."""
+    return read_manifest(ensure_store(csv_path, cache_dir))['sha1']
+
+
+def open_columns(cache_dir, columns=None):
+    """{column: read only np.memmap} of an existing store."""
+    manifest = read_manifest(cache_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"no column store in {cache_dir}")
+    dtypes = manifest['columns']
+    columns = list(dtypes) if columns is None else columns
+    missing = [col for col in columns if col not in dtypes]
+    if missing:
+        raise KeyError(f"columns {missing} are not in the store, available: {list(dtypes)}")
+    if not manifest['rows']:
+        # An empty file cannot be mapped
+        return {col: np.empty(0, dtype=dtypes[col]) for col in columns}
+    return {col: np.memmap(column_path(cache_dir, col), dtype=dtypes[col], mode='r', shape=(manifest['rows'],))
+            for col in columns}
+
+
+def load(csv_path, columns=None, cache_dir=None):
+    """DataFrame view of the mapped columns. The data is not copied: pages are read
+    from disk (or the shared page cache) when they are first touched."""
+    cache_dir = ensure_store(csv_path, cache_dir)
+    return pd.DataFrame(open_columns(cache_dir, columns), copy=False)
+
+
+def iter_load(csv_path, columns=None, chunksize=CHUNK_SIZE, cache_dir=None):
+    """Same as load(), but yields row slices (views) like iter_chunks yields chunks."""
+    df = load(csv_path, columns, cache_dir)
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+if __name__ == '__main__':
+    import sys
+
+    build_store(sys.argv[1] if len(sys.argv) > 1 else 'lol_ranked_games.csv')
@@ -0,0 +1,132 @@
+"""Derived per row features of lol_ranked_games.csv, computed lazily and shared.
+
+Features(frame) computes a feature the first time it is asked for and keeps it as
+long as the Features object lives. The features are NumPy arrays on the narrow
+dtypes of common.schema (float32 ratios where that is exact, int16 sums), the
+frame never gets extra columns. features_of(frame) hands out the Features object
+of a frame while someone still uses it (weak references), so the charts that work
+on the same chunk compute every feature once. Everything is released with the
+last reference.
+
+Buckets are numbered with np.searchsorted instead of pd.cut: bucket_codes() gives
+the right closed bucket of every value (-1 outside the edges) and
+equal_width_edges() the edges of pd.cut(bins=n).
+"""
+import weakref
+
+import numpy as np
+
+TURRET_COLUMNS = [
+    'destroyedTopNexusTurret', 'destroyedMidNexusTurret', 'destroyedBotNexusTurret',
+    'destroyedTopBaseTurret', 'destroyedMidBaseTurret', 'destroyedBotBaseTurret',
+    'destroyedTopInnerTurret', 'destroyedMidInnerTurret', 'destroyedBotInnerTurret',
+    'destroyedTopOuterTurret', 'destroyedMidOuterTurret', 'destroyedBotOuterTurret',
+]
+
+
+def _float32(values):
+    return np.asarray(values, dtype=np.float32)
+
+
+def kill_participation(kills, deaths, assists):
+    # (assists + kills) / (kills + deaths) clipped to [0, 2]: rows without kills and deaths give 2
+    # if they have assists, else 0. float64: the 1e-6 keeps a ratio of 1 just below the 1.0 bin
+    # edge, float32 would round it onto the edge
+    ratio = (assists + kills) / ((kills + deaths) + 1e-6)
+    return np.clip(ratio, 0, 2, out=ratio)
+
+
+def kda(kills, deaths, assists):
+    return _float32(kills + assists) / _float32(np.maximum(deaths, 1))
+
+
+def assist_death_ratio(deaths, assists):
+    return _float32(assists) / _float32(np.maximum(deaths, 1))
+
+
+def total_turrets_destroyed(*turrets):
+    # Added up column by column, no (rows x 12) intermediate array
+    total = np.zeros(len(turrets[0]), dtype=np.int16)
+    for column in turrets:
+        total += column
+    return total
+
+
+# Feature -> (input columns, function of the input arrays in that order)
+FEATURES = {
+    'kill_participation': (['kills', 'deaths', 'assists'], kill_participation),
+    'kda': (['kills', 'deaths', 'assists'], kda),
+    'assist_death_ratio': (['deaths', 'assists'], assist_death_ratio),
+    'total_turrets_destroyed': (TURRET_COLUMNS, total_turrets_destroyed),
+}
+
+
+def input_columns(columns):
+    """Raw CSV columns needed for the columns (features replaced by their inputs)."""
+    needed = []
+    for col in columns:
+        for raw in (FEATURES[col][0] if col in FEATURES else [col]):
+            if raw not in needed:
+                needed.append(raw)
+    return needed
+
+
+class Features:
+    """Column access for one frame: CSV columns and features as NumPy arrays."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.computed = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __getitem__(self, column):
+        if column not in FEATURES:
+            return self.frame[column].to_numpy()
+        if column in self.computed:
+            self.hits += 1
+        else:
+            self.misses += 1
+            inputs, compute = FEATURES[column]
+            self.computed[column] = compute(*(self.frame[col].to_numpy() for col in inputs))
+        return self.computed[column]
+
+    def release(self, *columns):
+        # Drops computed features early, e.g. once a chart no longer needs them
+        for column in columns or list(self.computed):
+            self.computed.pop(column, None)
+
+
+# id(frame) -> Features, an entry disappears with the last reference to its Features
+_shared = weakref.WeakValueDictionary()
+
+
+def features_of(frame):
+    """The Features of a frame, shared with every other user of the same frame."""
+    features = _shared.get(id(frame))
+    # The Features keeps its frame alive, so the id cannot belong to a new frame yet
+    if features is None or features.frame is not frame:
+        features = Features(frame)
+        _shared[id(frame)] = features
+    return features
+
+
+def bucket_codes(values, edges):
+    """Right closed bucket (edges[i], edges[i + 1]] of every value, -1 outside the edges."""
+    edges = np.asarray(edges, dtype='float64')
+    codes = np.searchsorted(edges, values, side='left') - 1
+    codes[(codes < 0) | (codes >= len(edges) - 1)] = -1
+    return codes
+
+
+def equal_width_edges(values, bins):
+    """Edges of pd.cut(values, bins=n): n equal width buckets over the observed range,
+    the first edge lowered by 0.1% of the range so the minimum is included."""
+    values = np.asarray(values, dtype='float64')
+    lo, hi = np.nanmin(values), np.nanmax(values)
+    if lo == hi:
+        adj = 0.001 * abs(lo) if lo != 0 else 0.001
+        return np.linspace(lo - adj, hi + adj, bins + 1)
+    edges = np.linspace(lo, hi, bins + 1)
+    edges[0] -= (hi - lo) * 0.001
+    return edges
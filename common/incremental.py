@@ -0,0 +1,125 @@
+"""Incremental (append only) loading of lol_ranked_games.csv.
+
+The file is split into raw byte chunks that always end on a game boundary, so a
+chunk holds complete games. Two control tables remember what was loaded:
+
+- etl_loaded_chunk: sha1 of every loaded chunk. A chunk with a known hash is
+  skipped without being parsed by pandas.
+- etl_loaded_game: every loaded gameId (the watermark). Rows of games that are
+  already loaded are dropped from new chunks, e.g. when appended rows change the
+  bytes of the last chunk of the previous run.
+
+A re-run therefore only parses and loads games that were not loaded before.
+"""
+import hashlib
+import io
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import MetaData, Table, Column, BigInteger, Integer, String, DateTime, select
+
+from common.reader import CHUNK_SIZE
+from common.schema import pandas_dtypes
+
+metadata = MetaData()
+
+loaded_chunk = Table(
+    'etl_loaded_chunk', metadata,
+    Column('chunk_hash', String(40), primary_key=True),
+    Column('source', String(255)),
+    Column('byte_offset', BigInteger),
+    Column('first_game_id', BigInteger),
+    Column('last_game_id', BigInteger),
+    Column('n_rows', Integer),
+    Column('loaded_at', DateTime, default=datetime.now),
+)
+
+loaded_game = Table(
+    'etl_loaded_game', metadata,
+    Column('game_id', BigInteger, primary_key=True),
+)
+
+
+class RawChunk:
+    def __init__(self, header, body, offset, first_game_id, last_game_id, n_rows):
+        self.header = header
+        self.body = body
+        self.offset = offset
+        self.first_game_id = first_game_id
+        self.last_game_id = last_game_id
+        self.n_rows = n_rows
+        self.hash = hashlib.sha1(body).hexdigest()
+
+    def parse(self, usecols=None):
+        columns = usecols or self.header.decode().strip().split(',')
+        return pd.read_csv(io.BytesIO(self.header + self.body), usecols=usecols, dtype=pandas_dtypes(columns))
+
+
+def iter_raw_chunks(path, chunksize=CHUNK_SIZE):
+    """Yields RawChunks of at least chunksize lines, cut where the gameId changes.
+
+    Only the gameId (first field) of each line is looked at, nothing is parsed.
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        offset = f.tell()
+        lines = []
+        first = last = None
+        skipped = 0  # bytes of skipped lines inside the current chunk
+        for line in f:
+            # Blank lines (e.g. at the end of the file) have no game id, the offsets still count them
+            if not line.strip():
+                if lines:
+                    skipped += len(line)
+                else:
+                    offset += len(line)
+                continue
+            game_id = int(line.split(b',', 1)[0])
+            if len(lines) >= chunksize and game_id != last:
+                body = b''.join(lines)
+                yield RawChunk(header, body, offset, first, last, len(lines))
+                offset += len(body) + skipped
+                skipped = 0
+                lines = []
+                first = None
+            if first is None:
+                first = game_id
+            last = game_id
+            lines.append(line)
+        if lines:
+            yield RawChunk(header, b''.join(lines), offset, first, last, len(lines))
+
+
+class LoadControl:
+    def __init__(self, engine):
+        self.engine = engine
+        metadata.create_all(engine)
+        with engine.connect() as conn:
+            self.chunk_hashes = set(conn.execute(select(loaded_chunk.c.chunk_hash)).scalars())
+            self.game_ids = set(conn.execute(select(loaded_game.c.game_id)).scalars())
+
+    def record(self, conn, chunk, source, game_ids):
+        # Call inside the transaction that wrote the chunk, so both commit together
+        new_games = [{'game_id': int(g)} for g in game_ids if g not in self.game_ids]
+        if new_games:
+            conn.execute(loaded_game.insert(), new_games)
+        conn.execute(loaded_chunk.insert(), [{
+            'chunk_hash': chunk.hash, 'source': source, 'byte_offset': chunk.offset,
+            'first_game_id': chunk.first_game_id, 'last_game_id': chunk.last_game_id,
+            'n_rows': chunk.n_rows,
+        }])
+        self.chunk_hashes.add(chunk.hash)
+        self.game_ids.update(int(g) for g in game_ids)
+
+
+def iter_new_chunks(path, control, chunksize=CHUNK_SIZE, usecols=None):
+    """Yields (RawChunk, DataFrame) with only the rows of games that are not loaded yet."""
+    skipped = 0
+    for chunk in iter_raw_chunks(path, chunksize):
+        if chunk.hash in control.chunk_hashes:
+            skipped += 1
+            continue
+        df = chunk.parse(usecols)
+        df = df[~df['gameId'].isin(control.game_ids)]
+        yield chunk, df
+    print(f"[INFO] Skipped {skipped} chunks that were already loaded")
@@ -0,0 +1,189 @@
+"""Stage timers and run report of the ETL scripts.
+
+A RunStats collects, per stage (extract, transform, lookup, insert, commit, ...),
+the time spent, the number of calls and the rows handled, plus the SQL statements
+and commits of the watched SQLAlchemy engines and the peak RSS of the process:
+
+    stats = RunStats('etl_fake', profile=['transform'])
+    stats.watch(engine)
+    for chunk in stats.iter_stage('extract', iter_chunks(path)):
+        with stats.stage('transform', rows=len(chunk)):
+            ...
+    stats.write('run.json')
+
+Stages can be entered from several threads (the parallel loader), their seconds
+are then the sum over the threads and can be larger than the wall time. Stages in
+the profile list are run under cProfile, the stats are dumped next to the report
+(<report>.<stage>.prof, open them with python -m pstats or snakeviz).
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+from sqlalchemy import event
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # only needed where resource is not available
+    psutil = None
+
+STAGES = ['extract', 'transform', 'lookup', 'insert', 'commit']
+
+
+def peak_rss_mb():
+    """Peak resident set size of the process in MB, None when it cannot be measured."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 2**20
+    return None
+
+
+class RunStats:
+    def __init__(self, name, profile=None):
+        self.name = name
+        self.profile = set(profile or [])
+        self.started = datetime.now()
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.statements = 0
+        self.commits = 0
+        self.profiles = {}
+        self._profiling = False
+        self._lock = threading.Lock()
+
+    def _add(self, name, seconds, rows):
+        with self._lock:
+            stage = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'rows': 0})
+            stage['seconds'] += seconds
+            stage['calls'] += 1
+            stage['rows'] += rows or 0
+
+    def add_rows(self, name, rows):
+        # For stages whose row count is only known after they ran
+        with self._lock:
+            self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'rows': 0})['rows'] += rows
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        profiler = None
+        if name in self.profile:
+            # One profiler at a time: a nested stage or another thread is not profiled
+            with self._lock:
+                if not self._profiling:
+                    self._profiling = True
+                    profiler = self.profiles.setdefault(name, cProfile.Profile())
+            if profiler is not None:
+                profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - start, rows)
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+
+    def timed(self, name, rows=None):
+        """Decorator version of stage(), rows is a function of the result (e.g. len)."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                result = func(*args, **kwargs)
+                self._add(name, time.perf_counter() - start, rows(result) if rows else None)
+                return result
+            return wrapper
+        return decorator
+
+    def iter_stage(self, name, iterable, rows=len):
+        """Yields the items of iterable, the time spent producing them is the stage."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self._add(name, time.perf_counter() - start, rows(item) if rows else None)
+            yield item
+
+    def watch(self, engine):
+        """Counts the statements and commits that go through a SQLAlchemy engine.
+
+        Raw DBAPI calls (executemany on driver_connection) and JDBC writes are not seen.
+        """
+        def count_statement(*_):
+            with self._lock:
+                self.statements += 1
+
+        def count_commit(*_):
+            with self._lock:
+                self.commits += 1
+
+        event.listen(engine, 'before_cursor_execute', count_statement)
+        event.listen(engine, 'commit', count_commit)
+        return engine
+
+    def rows(self):
+        # Rows of the run = rows read by the extract stage, or the largest stage count without one
+        if 'extract' in self.stages:
+            return self.stages['extract']['rows']
+        return max((stage['rows'] for stage in self.stages.values()), default=0)
+
+    def report(self):
+        wall = time.perf_counter() - self.start
+        stages = {}
+        for name in STAGES + [name for name in self.stages if name not in STAGES]:
+            if name in self.stages:
+                stage = dict(self.stages[name])
+                stage['rows_per_second'] = stage['rows'] / stage['seconds'] if stage['rows'] and stage['seconds'] else None
+                stages[name] = stage
+        return {
+            'name': self.name,
+            'started': self.started.isoformat(timespec='seconds'),
+            'wall_seconds': wall,
+            'rows': self.rows(),
+            'rows_per_second': self.rows() / wall if wall else None,
+            'stages': stages,
+            'sql_statements': self.statements,
+            'commits': self.commits,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+    def print_report(self):
+        report = self.report()
+        for name, stage in report['stages'].items():
+            rate = f", {stage['rows_per_second']:,.0f} rows/s" if stage['rows_per_second'] else ''
+            print(f"[INFO] {name:<10} {stage['seconds']:8.2f}s  {stage['calls']:>7} calls{rate}")
+        rss = report['peak_rss_mb']
+        print(f"[INFO] {report['rows']} rows in {report['wall_seconds']:.2f}s, "
+              f"{report['sql_statements']} SQL statements, {report['commits']} commits"
+              + (f", peak RSS {rss:.0f} MB" if rss is not None else ''))
+        return report
+
+    def write(self, path):
+        """Writes the JSON report and the cProfile stats of the profiled stages."""
+        report = self.report()
+        report['profiles'] = {}
+        for name, profiler in self.profiles.items():
+            prof_path = f'{os.path.splitext(path)[0]}.{name}.prof'
+            profiler.dump_stats(prof_path)
+            report['profiles'][name] = prof_path
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        return report
@@ -0,0 +1,150 @@
+"""Columnar Parquet cache of lol_ranked_games.csv.
+
+The CSV is converted once into a Parquet dataset partitioned by game phase
+(<csv name>.parquet/game_phase=Early/part-00000.parquet, ...). Loads read only
+the requested columns and skip partitions/row groups that the filters exclude.
+The cache is rebuilt when the source CSV changes (mtime/size, confirmed by hash).
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from common.reader import CHUNK_SIZE, iter_chunks, read_csv
+from common.schema import game_phases
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # the cache is optional, loads fall back to the CSV reader
+    pa = None
+    ds = None
+    pq = None
+
+MANIFEST = '_manifest.json'
+PARTITION_COLUMN = 'game_phase'
+
+
+def cache_dir_for(csv_path):
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def file_hash(path, block_size=2**20):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def source_info(csv_path):
+    stat = os.stat(csv_path)
+    return {'source': os.path.abspath(csv_path), 'mtime': stat.st_mtime, 'size': stat.st_size}
+
+
+def read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(csv_path, cache_dir=None):
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    manifest = read_manifest(cache_dir)
+    if manifest is None:
+        return False
+    info = source_info(csv_path)
+    if manifest['size'] != info['size']:
+        return False
+    if manifest['mtime'] == info['mtime']:
+        return True
+    # Touched but maybe not changed: compare content before throwing the cache away
+    if manifest['sha1'] != file_hash(csv_path):
+        return False
+    manifest['mtime'] = info['mtime']
+    with open(os.path.join(cache_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return True
+
+
+def build_cache(csv_path, cache_dir=None, chunksize=CHUNK_SIZE):
+    """Converts the CSV into the partitioned Parquet cache, one row group per chunk and phase."""
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    tmp_dir = cache_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    rows = 0
+    for i, chunk in enumerate(iter_chunks(csv_path, chunksize)):
+        phases = game_phases(chunk['frame'])
+        for phase in np.unique(phases):
+            part_dir = os.path.join(tmp_dir, f'{PARTITION_COLUMN}={phase}')
+            os.makedirs(part_dir, exist_ok=True)
+            table = pa.Table.from_pandas(chunk[phases == phase], preserve_index=False)
+            pq.write_table(table, os.path.join(part_dir, f'part-{i:05d}.parquet'))
+        rows += len(chunk)
+
+    manifest = dict(source_info(csv_path), sha1=file_hash(csv_path), rows=rows)
+    with open(os.path.join(tmp_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap in the finished cache so readers never see a half written one
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    return cache_dir
+
+
+def ensure_cache(csv_path, cache_dir=None):
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    if not is_fresh(csv_path, cache_dir):
+        print(f"[INFO] Building Parquet cache {cache_dir}")
+        build_cache(csv_path, cache_dir)
+    return cache_dir
+
+
+def fingerprint(csv_path, cache_dir=None):
+    """Content hash of the source CSV, taken from the cache manifest when it is fresh."""
+    if pa is None:
+        return file_hash(csv_path)
+    cache_dir = ensure_cache(csv_path, cache_dir)
+    return read_manifest(cache_dir)['sha1']
+
+
+def load(csv_path, columns=None, filters=None, cache_dir=None):
+    """Reads the requested columns of the dataset from the Parquet cache.
+
+    filters uses the pyarrow DNF format, e.g. [('game_phase', '=', 'Early'), ('frame', '<', 600)].
+    Without pyarrow the columns are read from the CSV and filters are not supported.
+    """
+    if pa is None:
+        if filters:
+            raise ImportError('pyarrow is required for filtered loads')
+        return read_csv(csv_path, usecols=columns)
+    cache_dir = ensure_cache(csv_path, cache_dir)
+    table = pq.read_table(cache_dir, columns=columns, filters=filters, partitioning='hive')
+    return table.to_pandas()
+
+
+
+def iter_load(csv_path, columns=None, filters=None, cache_dir=None):
+    """Same as load(), but yields record batches as DataFrames so only one is in memory."""
+    if pa is None:
+        if filters:
+            raise ImportError('pyarrow is required for filtered loads')
+        yield from iter_chunks(csv_path, usecols=columns)
+        return
+    cache_dir = ensure_cache(csv_path, cache_dir)
+    dataset = ds.dataset(cache_dir, format='parquet', partitioning='hive')
+    expression = pq.filters_to_expression(filters) if filters else None
+    for batch in dataset.to_batches(columns=columns, filter=expression):
+        yield batch.to_pandas()
+
+
+if __name__ == '__main__':
+    import sys
+
+    build_cache(sys.argv[1] if len(sys.argv) > 1 else 'lol_ranked_games.csv')
@@ -0,0 +1,112 @@
+"""Staged ETL pipeline: reading, transforming and writing chunks at the same time.
+
+    reader thread -> [queue] -> transform workers -> [queue] -> writer (calling thread)
+
+The queues are bounded, so a slow writer blocks the transform workers and those
+block the reader: at most about depth chunks per stage are in memory. The writer
+gets the results in chunk order. With more than one transform worker the transform
+must not depend on the previous chunks; the loaders here carry state from chunk to
+chunk (seen games, counter deltas, key caches) and use one worker, which still
+overlaps the CSV parsing, the transform and the database writes.
+
+The writer stays a single stage in the calling thread, one batch at a time. A batch
+inserts the dimension members that the fact rows of the following batches reference
+(the key caches count them as members as soon as they are prepared), so the batches
+must commit in chunk order, and SQLite allows only one writer anyway. Writes that can
+run in parallel are done inside the write function, e.g. spi.py's ParallelLoader
+writes the tables of a chunk on its own connections after the game table.
+
+An exception in any stage stops the other stages and is raised by run().
+"""
+import queue
+import threading
+
+DONE = object()
+POLL_SECONDS = 0.1
+
+
+class StagedPipeline:
+    def __init__(self, transform, write, workers=1, depth=2):
+        self.transform = transform
+        self.write = write
+        self.workers = workers
+        self.depth = depth
+        self.stop = threading.Event()
+
+    def _put(self, q, item):
+        # Blocks while the queue is full, gives up when another stage failed
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, q):
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                pass
+        return DONE
+
+    def _read(self, chunks, inbox, outbox):
+        try:
+            for item in enumerate(chunks):
+                if not self._put(inbox, item):
+                    return
+        except BaseException as e:
+            self._put(outbox, (None, e))
+        finally:
+            for _ in range(self.workers):
+                self._put(inbox, DONE)
+
+    def _work(self, inbox, outbox):
+        while True:
+            item = self._get(inbox)
+            if item is DONE:
+                self._put(outbox, DONE)
+                return
+            seq, chunk = item
+            try:
+                result = self.transform(chunk)
+            except BaseException as e:
+                self._put(outbox, (None, e))
+                return
+            if not self._put(outbox, (seq, result)):
+                return
+
+    def run(self, chunks):
+        """Transforms and writes all chunks, returns the number of chunks written."""
+        self.stop.clear()
+        inbox = queue.Queue(self.depth)
+        outbox = queue.Queue(self.depth * self.workers)
+        threads = [threading.Thread(target=self._read, args=(chunks, inbox, outbox), daemon=True)]
+        threads += [threading.Thread(target=self._work, args=(inbox, outbox), daemon=True)
+                    for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        pending = {}
+        written = 0
+        finished = 0
+        try:
+            while finished < self.workers:
+                item = outbox.get()
+                if item is DONE:
+                    finished += 1
+                    continue
+                seq, result = item
+                if seq is None:
+                    raise result
+                # Results of several workers can arrive out of order
+                pending[seq] = result
+                while written in pending:
+                    self.write(pending.pop(written))
+                    written += 1
+        finally:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        return written
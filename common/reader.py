@@ -0,0 +1,27 @@
+import pandas as pd
+
+from common.schema import pandas_dtypes
+
+CHUNK_SIZE = 100000
+
+
+def read_header(path):
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def iter_chunks(path, chunksize=CHUNK_SIZE, usecols=None, nrows=None):
+    """Yields typed DataFrame chunks of the CSV, so only one chunk is in memory at a time.
+
+    The index keeps counting across chunks, same as a single read_csv would give.
+    """
+    columns = usecols or read_header(path)
+    reader = pd.read_csv(path, usecols=usecols, dtype=pandas_dtypes(columns),
+                         chunksize=chunksize, nrows=nrows)
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+
+def read_csv(path, usecols=None, nrows=None, chunksize=CHUNK_SIZE):
+    # Whole (column subset of the) dataset, still parsed chunk by chunk with the compact dtypes
+    return pd.concat(iter_chunks(path, chunksize, usecols, nrows))
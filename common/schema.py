@@ -0,0 +1,165 @@
+"""Column schema of lol_ranked_games.csv.
+
+Every loader takes its dtypes from here instead of letting pandas/Spark infer
+int64/float64 (or strings) for everything. The dtypes are the narrowest ones
+that still hold the values of the SoloQ dataset.
+"""
+import numpy as np
+import pandas as pd
+
+# Cumulative objective/structure counters are small non negative counts
+COUNTER_PREFIXES = ('killed', 'lost', 'destroyed')
+
+COUNTER_COLUMNS = [
+    'killedFireDrake', 'killedWaterDrake', 'killedAirDrake', 'killedEarthDrake', 'killedElderDrake',
+    'lostFireDrake', 'lostWaterDrake', 'lostAirDrake', 'lostEarthDrake', 'lostElderDrake',
+    'killedBaronNashor', 'lostBaronNashor', 'killedRiftHerald', 'lostRiftHerald',
+    'destroyedTopInhibitor', 'destroyedMidInhibitor', 'destroyedBotInhibitor',
+    'lostTopInhibitor', 'lostMidInhibitor', 'lostBotInhibitor',
+    'destroyedTopNexusTurret', 'destroyedMidNexusTurret', 'destroyedBotNexusTurret',
+    'lostTopNexusTurret', 'lostMidNexusTurret', 'lostBotNexusTurret',
+    'destroyedTopBaseTurret', 'destroyedMidBaseTurret', 'destroyedBotBaseTurret',
+    'lostTopBaseTurret', 'lostMidBaseTurret', 'lostBotBaseTurret',
+    'destroyedTopInnerTurret', 'destroyedMidInnerTurret', 'destroyedBotInnerTurret',
+    'lostTopInnerTurret', 'lostMidInnerTurret', 'lostBotInnerTurret',
+    'destroyedTopOuterTurret', 'destroyedMidOuterTurret', 'destroyedBotOuterTurret',
+    'lostTopOuterTurret', 'lostMidOuterTurret', 'lostBotOuterTurret',
+]
+
+# Star schema member of every counter: (dimension, name, category, type, lane).
+# lost* counters are members of their own, they count what the enemy team took
+COUNTER_MEMBERS = {
+    'killedFireDrake': ('objective', 'FireDrake', 'Dragon', 'Fire', None),
+    'killedWaterDrake': ('objective', 'WaterDrake', 'Dragon', 'Water', None),
+    'killedAirDrake': ('objective', 'AirDrake', 'Dragon', 'Air', None),
+    'killedEarthDrake': ('objective', 'EarthDrake', 'Dragon', 'Earth', None),
+    'killedElderDrake': ('objective', 'ElderDrake', 'Dragon', 'Elder', None),
+    'lostFireDrake': ('objective', 'LostFireDrake', 'Dragon', 'Fire', None),
+    'lostWaterDrake': ('objective', 'LostWaterDrake', 'Dragon', 'Water', None),
+    'lostAirDrake': ('objective', 'LostAirDrake', 'Dragon', 'Air', None),
+    'lostEarthDrake': ('objective', 'LostEarthDrake', 'Dragon', 'Earth', None),
+    'lostElderDrake': ('objective', 'LostElderDrake', 'Dragon', 'Elder', None),
+    'killedBaronNashor': ('objective', 'BaronNashor', 'Baron', 'BaronNashor', None),
+    'lostBaronNashor': ('objective', 'LostBaronNashor', 'Baron', 'BaronNashor', None),
+    'killedRiftHerald': ('objective', 'RiftHerald', 'Herald', 'RiftHerald', None),
+    'lostRiftHerald': ('objective', 'LostRiftHerald', 'Herald', 'RiftHerald', None),
+    'destroyedTopInhibitor': ('structure', 'TopInhibitor', 'Inhibitor', 'Inhibitor', 'Top'),
+    'destroyedMidInhibitor': ('structure', 'MidInhibitor', 'Inhibitor', 'Inhibitor', 'Mid'),
+    'destroyedBotInhibitor': ('structure', 'BotInhibitor', 'Inhibitor', 'Inhibitor', 'Bot'),
+    'lostTopInhibitor': ('structure', 'LostTopInhibitor', 'Inhibitor', 'Inhibitor', 'Top'),
+    'lostMidInhibitor': ('structure', 'LostMidInhibitor', 'Inhibitor', 'Inhibitor', 'Mid'),
+    'lostBotInhibitor': ('structure', 'LostBotInhibitor', 'Inhibitor', 'Inhibitor', 'Bot'),
+    'destroyedTopNexusTurret': ('structure', 'TopNexusTurret', 'Turret', 'NexusTurret', 'Top'),
+    'destroyedMidNexusTurret': ('structure', 'MidNexusTurret', 'Turret', 'NexusTurret', 'Mid'),
+    'destroyedBotNexusTurret': ('structure', 'BotNexusTurret', 'Turret', 'NexusTurret', 'Bot'),
+    'lostTopNexusTurret': ('structure', 'LostTopNexusTurret', 'Turret', 'NexusTurret', 'Top'),
+    'lostMidNexusTurret': ('structure', 'LostMidNexusTurret', 'Turret', 'NexusTurret', 'Mid'),
+    'lostBotNexusTurret': ('structure', 'LostBotNexusTurret', 'Turret', 'NexusTurret', 'Bot'),
+    'destroyedTopBaseTurret': ('structure', 'TopBaseTurret', 'Turret', 'BaseTurret', 'Top'),
+    'destroyedMidBaseTurret': ('structure', 'MidBaseTurret', 'Turret', 'BaseTurret', 'Mid'),
+    'destroyedBotBaseTurret': ('structure', 'BotBaseTurret', 'Turret', 'BaseTurret', 'Bot'),
+    'lostTopBaseTurret': ('structure', 'LostTopBaseTurret', 'Turret', 'BaseTurret', 'Top'),
+    'lostMidBaseTurret': ('structure', 'LostMidBaseTurret', 'Turret', 'BaseTurret', 'Mid'),
+    'lostBotBaseTurret': ('structure', 'LostBotBaseTurret', 'Turret', 'BaseTurret', 'Bot'),
+    'destroyedTopInnerTurret': ('structure', 'TopInnerTurret', 'Turret', 'InnerTurret', 'Top'),
+    'destroyedMidInnerTurret': ('structure', 'MidInnerTurret', 'Turret', 'InnerTurret', 'Mid'),
+    'destroyedBotInnerTurret': ('structure', 'BotInnerTurret', 'Turret', 'InnerTurret', 'Bot'),
+    'lostTopInnerTurret': ('structure', 'LostTopInnerTurret', 'Turret', 'InnerTurret', 'Top'),
+    'lostMidInnerTurret': ('structure', 'LostMidInnerTurret', 'Turret', 'InnerTurret', 'Mid'),
+    'lostBotInnerTurret': ('structure', 'LostBotInnerTurret', 'Turret', 'InnerTurret', 'Bot'),
+    'destroyedTopOuterTurret': ('structure', 'TopOuterTurret', 'Turret', 'OuterTurret', 'Top'),
+    'destroyedMidOuterTurret': ('structure', 'MidOuterTurret', 'Turret', 'OuterTurret', 'Mid'),
+    'destroyedBotOuterTurret': ('structure', 'BotOuterTurret', 'Turret', 'OuterTurret', 'Bot'),
+    'lostTopOuterTurret': ('structure', 'LostTopOuterTurret', 'Turret', 'OuterTurret', 'Top'),
+    'lostMidOuterTurret': ('structure', 'LostMidOuterTurret', 'Turret', 'OuterTurret', 'Mid'),
+    'lostBotOuterTurret': ('structure', 'LostBotOuterTurret', 'Turret', 'OuterTurret', 'Bot'),
+}
+
+FLAG_COLUMNS = ['hasWon', 'isFirstTower', 'isFirstBlood']
+
+# Column order as in the Kaggle CSV
+COLUMNS = {
+    'gameId': 'int64',          # ids are above the int32/uint32 range
+    'gameDuration': 'int16',    # seconds
+    'hasWon': 'bool',
+    'frame': 'int16',
+    'goldDiff': 'int32',
+    'expDiff': 'int32',
+    'champLevelDiff': 'float32',
+    'isFirstTower': 'bool',
+    'isFirstBlood': 'bool',
+    **{col: 'int8' for col in COUNTER_COLUMNS},
+    'kills': 'int16',
+    'deaths': 'int16',
+    'assists': 'int16',
+    'wardsPlaced': 'int16',
+    'wardsDestroyed': 'int16',
+    'wardsLost': 'int16',
+}
+
+# Derived columns with a handful of values are stored as categories
+GAME_PHASE_DTYPE = pd.CategoricalDtype(['Early', 'Mid', 'Late'], ordered=True)
+
+
+def game_phases(frames):
+    # Vectorized get_game_phase of the star schema ETL: Early < 900 <= Mid < 1800 <= Late
+    frames = np.asarray(frames)
+    return np.select([frames < 900, frames < 1800], ['Early', 'Mid'], default='Late')
+
+
+def pandas_dtype(column):
+    if column in COLUMNS:
+        return COLUMNS[column]
+    if column.startswith(COUNTER_PREFIXES):
+        return 'int8'
+    return None
+
+
+def pandas_dtypes(columns=None):
+    """dtype= argument for pd.read_csv, columns that are not in the schema are inferred."""
+    columns = COLUMNS if columns is None else columns
+    return {col: pandas_dtype(col) for col in columns if pandas_dtype(col) is not None}
+
+
+def spark_schema(columns=None):
+    """StructType for spark.read.csv, the fields follow the order of the CSV header."""
+    from pyspark.sql.types import (StructType, StructField, LongType, IntegerType,
+                                   ShortType, ByteType, FloatType, StringType)
+
+    # Spark only parses true/false as BooleanType, the 0/1 flags are read as bytes
+    spark_types = {
+        'int64': LongType(), 'int32': IntegerType(), 'int16': ShortType(),
+        'int8': ByteType(), 'bool': ByteType(), 'float32': FloatType(),
+    }
+    columns = list(COLUMNS) if columns is None else columns
+    return StructType([
+        StructField(col, spark_types.get(pandas_dtype(col), StringType()), True)
+        for col in columns
+    ])
+
+
+def memory_report(path, chunksize=100000):
+    """Per column memory of the whole CSV with inferred vs. declared dtypes (bytes)."""
+    inferred = None
+    declared = None
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        usage = chunk.memory_usage(index=False, deep=True)
+        inferred = usage if inferred is None else inferred + usage
+        typed = chunk.astype(pandas_dtypes(chunk.columns))
+        usage = typed.memory_usage(index=False, deep=True)
+        declared = usage if declared is None else declared + usage
+
+    report = pd.DataFrame({'inferred': inferred, 'declared': declared})
+    report.loc['TOTAL'] = report.sum()
+    report['ratio'] = (report['inferred'] / report['declared']).round(2)
+    return report
+
+
+if __name__ == '__main__':
+    import sys
+
+    report = memory_report(sys.argv[1] if len(sys.argv) > 1 else 'lol_ranked_games.csv')
+    print(report.to_string())
+    total = report.loc['TOTAL']
+    print(f"\nInferred: {total['inferred'] / 2**20:.1f} MiB, "
+          f"declared: {total['declared'] / 2**20:.1f} MiB ({total['ratio']}x smaller)")
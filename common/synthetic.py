@@ -0,0 +1,170 @@
+"""Synthetic lol_ranked_games.csv for benchmarks and tests of the pipelines.
+
+Writes a CSV with exactly the columns (and column order) of the Kaggle dataset, see
+common.schema.COLUMNS: one row per minute of every game, seen from one team. Every
+game has a hidden strength of the team that drives the outcome and the drift of the
+gold/experience difference, the kill/ward counters and the objective/structure
+counters are cumulative per game:
+
+- drakes from minute 5 (elder drakes from minute 35), the rift herald between minute
+  8 and 20 (at most two per team), baron from minute 20,
+- turrets fall lane by lane, outer -> inner -> base -> inhibitor -> nexus turret,
+  faster for the stronger team,
+- isFirstBlood/isFirstTower switch to 1 when the team got the first kill/turret.
+
+Games are generated in batches with NumPy (about 50k rows/s including the CSV
+writing) and only one batch is in memory. The same seed always gives the same file.
+
+    python -m common.synthetic lol_synthetic.csv --rows 1000000 --seed 0
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from common.schema import COLUMNS
+
+FIRST_GAME_ID = 4_000_000_000
+FRAME_STEP = 60
+LANES = ['Top', 'Mid', 'Bot']
+TIERS = ['OuterTurret', 'InnerTurret', 'BaseTurret', 'Inhibitor', 'NexusTurret']
+DRAKES = ['FireDrake', 'WaterDrake', 'AirDrake', 'EarthDrake']
+
+# Mean minutes between the events of one side
+DRAKE_MINUTES = 5.0
+HERALD_MINUTES = 6.0
+BARON_MINUTES = 10.0
+KILL_MINUTES = 2.5
+
+
+def game_frames(durations):
+    """Game index and frame of every row: frames 60, 120, ... up to the game duration."""
+    lengths = durations // FRAME_STEP
+    game = np.repeat(np.arange(len(durations)), lengths)
+    starts = np.cumsum(lengths) - lengths
+    frame = (np.arange(len(game)) - np.repeat(starts, lengths) + 1) * FRAME_STEP
+    return game, frame, starts, lengths
+
+
+def per_game_cumsum(values, starts, lengths):
+    # Running sums that restart at the first row of every game (rows of a game are contiguous)
+    total = np.cumsum(values, axis=0)
+    before = np.concatenate([np.zeros((1,) + total.shape[1:], total.dtype), total])[starts]
+    return total - np.repeat(before, lengths, axis=0)
+
+
+def first_true(flags, starts, lengths):
+    # Per game row: has the flag been set in this or an earlier frame of the game
+    return per_game_cumsum(flags.astype(np.int32), starts, lengths) > 0
+
+
+def generate_batch(rng, n_games, first_game_id):
+    """One DataFrame with the rows of n_games games, columns and dtypes as in common.schema."""
+    durations = np.clip(rng.normal(1800, 420, n_games), 960, 3300).astype(np.int64)
+    strength = rng.normal(0, 1, n_games)
+    has_won = (strength + rng.normal(0, 0.7, n_games)) > 0
+    game, frame, starts, lengths = game_frames(durations)
+    rows = len(game)
+    s = strength[game]
+    minute = frame / 60
+    # Probability that an objective contested in this frame goes to the team
+    p_team = 1 / (1 + np.exp(-1.2 * s))
+
+    data = {
+        'gameId': FIRST_GAME_ID + first_game_id + game,
+        'gameDuration': durations[game],
+        'hasWon': has_won[game],
+        'frame': frame,
+    }
+    gold = per_game_cumsum(rng.normal(60 * s * np.sqrt(minute) / 3, 300), starts, lengths)
+    data['goldDiff'] = np.round(gold)
+    data['expDiff'] = np.round(0.8 * gold + per_game_cumsum(rng.normal(0, 150, rows), starts, lengths))
+    data['champLevelDiff'] = np.clip(np.round(data['expDiff'] / 900), -6, 6)
+
+    kills = per_game_cumsum(rng.poisson(np.exp(0.25 * s) / KILL_MINUTES), starts, lengths)
+    deaths = per_game_cumsum(rng.poisson(np.exp(-0.25 * s) / KILL_MINUTES), starts, lengths)
+    assists = per_game_cumsum(rng.binomial(rng.poisson(np.exp(0.25 * s) / KILL_MINUTES * 2.5), 0.6),
+                              starts, lengths)
+    # First blood: the first frame of the game with a kill on either side, the team got it
+    # when it has at least as many kills as deaths in that frame
+    blood = first_true((kills + deaths) > 0, starts, lengths)
+    previous = np.r_[False, blood[:-1]]
+    previous[starts] = False
+    first_blood_frame = blood & ~previous
+    got_first_blood = np.logical_or.reduceat(first_blood_frame & (kills >= deaths), starts)
+
+    counters = {}
+    # Drakes: one contested drake every few minutes from minute 5, elder drake after minute 35
+    drake = (minute >= 5) & (rng.random(rows) < 1 / DRAKE_MINUTES)
+    team = rng.random(rows) < p_team
+    kind = np.where(minute >= 35, 'ElderDrake', np.array(DRAKES)[rng.integers(0, len(DRAKES), rows)])
+    for name in DRAKES + ['ElderDrake']:
+        counters[f'killed{name}'] = per_game_cumsum(drake & team & (kind == name), starts, lengths)
+        counters[f'lost{name}'] = per_game_cumsum(drake & ~team & (kind == name), starts, lengths)
+
+    herald = (minute >= 8) & (minute < 20) & (rng.random(rows) < 1 / HERALD_MINUTES)
+    team = rng.random(rows) < p_team
+    counters['killedRiftHerald'] = np.minimum(per_game_cumsum(herald & team, starts, lengths), 2)
+    counters['lostRiftHerald'] = np.minimum(per_game_cumsum(herald & ~team, starts, lengths), 2)
+    baron = (minute >= 20) & (rng.random(rows) < 1 / BARON_MINUTES)
+    team = rng.random(rows) < p_team
+    counters['killedBaronNashor'] = per_game_cumsum(baron & team, starts, lengths)
+    counters['lostBaronNashor'] = per_game_cumsum(baron & ~team, starts, lengths)
+
+    # Structures: per game, side and lane the minutes at which each tier falls
+    first_tower = np.full(n_games, np.inf)
+    first_tower_destroyed = np.zeros(n_games, dtype=bool)
+    for prefix, sign in [('destroyed', 1), ('lost', -1)]:
+        pace = np.exp(-0.25 * sign * strength)[:, None, None]
+        gaps = rng.exponential(4.5, (n_games, len(LANES), len(TIERS))) * pace
+        gaps[:, :, 0] += rng.normal(13, 3, (n_games, len(LANES))) * pace[:, :, 0]
+        falls = np.cumsum(gaps, axis=2)
+        first = falls[:, :, 0].min(axis=1)
+        first_tower_destroyed = np.where(first < first_tower, sign > 0, first_tower_destroyed)
+        first_tower = np.minimum(first_tower, first)
+        for l, lane in enumerate(LANES):
+            for t, tier in enumerate(TIERS):
+                counters[f'{prefix}{lane}{tier}'] = minute >= falls[game, l, t]
+
+    data['isFirstTower'] = (minute >= first_tower[game]) & first_tower_destroyed[game]
+    data['isFirstBlood'] = blood & got_first_blood[game]
+    data.update(counters)
+    data['kills'] = kills
+    data['deaths'] = deaths
+    data['assists'] = assists
+    data['wardsPlaced'] = per_game_cumsum(rng.poisson(2.8, rows), starts, lengths)
+    data['wardsDestroyed'] = per_game_cumsum(rng.poisson(0.35 * np.exp(0.2 * s)), starts, lengths)
+    data['wardsLost'] = per_game_cumsum(rng.poisson(0.35 * np.exp(-0.2 * s)), starts, lengths)
+
+    df = pd.DataFrame({col: data[col] for col in COLUMNS})
+    return df.astype(COLUMNS)
+
+
+def generate(path, rows, seed=0, games_per_batch=10000):
+    """Writes complete games until the file has at least rows rows, returns the row count."""
+    rng = np.random.default_rng(seed)
+    written = 0
+    games = 0
+    with open(path, 'w', newline='') as f:
+        while written < rows:
+            # ~29 rows per game on average, the last batch only gets the games still needed
+            n_games = max(1, min(games_per_batch, -(-(rows - written) // 29)))
+            batch = generate_batch(rng, n_games, games)
+            batch.astype({col: 'int8' for col in ['hasWon', 'isFirstTower', 'isFirstBlood']}) \
+                .to_csv(f, index=False, header=written == 0)
+            written += len(batch)
+            games += n_games
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Synthetic lol_ranked_games.csv')
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=100000, help='approximate number of rows (whole games)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = generate(args.path, args.rows, args.seed)
+    print(f"[INFO] {rows} rows written to {args.path} in {time.perf_counter() - start:.1f}s")
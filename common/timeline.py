@@ -0,0 +1,168 @@
+"""Per game timeline store for "state of game X at frame N" lookups.
+
+The rows are sorted by (gameId, frame) and kept as one contiguous NumPy array per
+column. A gameId -> (start, end) offset index finds the rows of a game in O(1),
+the frame inside a game is found with a binary search over its few dozen frames.
+Batches of (gameId, frame) pairs are answered with one searchsorted over a
+combined (game position, frame) key. The arrays can be saved as .npy files and
+memory mapped, so a store is opened without reading it.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from common.reader import CHUNK_SIZE, iter_chunks
+from common import column_store
+
+# fact_game_event column -> CSV column, for stores built from the star schema
+FACT_COLUMNS = {
+    'game_id': 'gameId',
+    'frame': 'frame',
+    'gold_diff': 'goldDiff',
+    'exp_diff': 'expDiff',
+    'champ_level_diff': 'champLevelDiff',
+    'is_first_tower': 'isFirstTower',
+    'is_first_blood': 'isFirstBlood',
+    'kills': 'kills',
+    'deaths': 'deaths',
+    'assists': 'assists',
+    'wards_placed': 'wardsPlaced',
+    'wards_destroyed': 'wardsDestroyed',
+    'wards_lost': 'wardsLost',
+}
+
+INDEX_FILE = '_timeline.json'
+
+
+class TimelineStore:
+    def __init__(self, columns):
+        """columns: {name: array}, already sorted by (gameId, frame)."""
+        self.columns = columns
+        game_ids = columns['gameId']
+        starts = np.flatnonzero(np.r_[True, game_ids[1:] != game_ids[:-1]]) if len(game_ids) else np.array([], int)
+        self.games = np.asarray(game_ids[starts])
+        self.starts = starts
+        self.ends = np.r_[starts[1:], len(game_ids)].astype(starts.dtype)
+        self.offsets = dict(zip(self.games.tolist(), zip(self.starts.tolist(), self.ends.tolist())))
+        # Position of the game in self.games in the high bits, the frame in the low bits
+        game_pos = np.repeat(np.arange(len(self.games), dtype=np.int64), self.ends - self.starts)
+        self.keys = (game_pos << 32) | np.asarray(columns['frame'], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_frame(cls, df):
+        df = df.sort_values(['gameId', 'frame'], kind='stable')
+        return cls({col: df[col].to_numpy() for col in df.columns})
+
+    @classmethod
+    def from_csv(cls, path, columns=None, chunksize=CHUNK_SIZE):
+        usecols = None if columns is None else list(dict.fromkeys(['gameId', 'frame'] + list(columns)))
+        return cls.from_frame(pd.concat(iter_chunks(path, chunksize, usecols)))
+
+    @classmethod
+    def from_column_store(cls, csv_path, columns=None):
+        # The CSV is stored game by game, so usually the mapped columns are used as they are
+        names = None if columns is None else list(dict.fromkeys(['gameId', 'frame'] + list(columns)))
+        mapped = column_store.open_columns(column_store.ensure_store(csv_path), names)
+        keys = np.asarray(mapped['gameId'])
+        frames = np.asarray(mapped['frame'])
+        if np.all((keys[1:] > keys[:-1]) | ((keys[1:] == keys[:-1]) & (frames[1:] >= frames[:-1]))):
+            return cls(mapped)
+        return cls.from_frame(pd.DataFrame(mapped))
+
+    @classmethod
+    def from_fact_table(cls, con):
+        # Only the state rows, one per CSV row (the other rows are objective/structure events)
+        columns = ', '.join(FACT_COLUMNS)
+        df = pd.read_sql(f"SELECT {columns} FROM fact_game_event "
+                         "WHERE objective_tk IS NULL AND structure_tk IS NULL", con)
+        return cls.from_frame(df.rename(columns=FACT_COLUMNS))
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, values in self.columns.items():
+            np.save(os.path.join(directory, f'{name}.npy'), np.asarray(values))
+        with open(os.path.join(directory, INDEX_FILE), 'w') as f:
+            json.dump({'columns': list(self.columns), 'rows': len(self)}, f, indent=2)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            names = json.load(f)['columns']
+        mode = 'r' if mmap else None
+        return cls({name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mode) for name in names})
+
+    def _frame(self, start, end, columns=None):
+        columns = columns or list(self.columns)
+        return pd.DataFrame({col: self.columns[col][start:end] for col in columns},
+                            index=pd.RangeIndex(start, end))
+
+    def game(self, game_id, columns=None):
+        start, end = self.offsets[game_id]
+        return self._frame(start, end, columns)
+
+    def range(self, game_id, first, last, columns=None):
+        # Frames first..last (inclusive) of one game
+        start, end = self.offsets[game_id]
+        frames = self.columns['frame'][start:end]
+        lo = start + np.searchsorted(frames, first, side='left')
+        hi = start + np.searchsorted(frames, last, side='right')
+        return self._frame(lo, hi, columns)
+
+    def at(self, game_id, frame, columns=None):
+        """State as of the frame: the last row of the game at or before it, KeyError if there is none."""
+        start, end = self.offsets[game_id]
+        pos = start + np.searchsorted(self.columns['frame'][start:end], frame, side='right') - 1
+        if pos < start:
+            raise KeyError((game_id, frame))
+        return pd.Series({col: self.columns[col][pos] for col in columns or self.columns}, name=pos)
+
+    def asof_positions(self, game_ids, frames):
+        """Row of every (gameId, frame) pair as of the frame, -1 where the game or an earlier frame is missing."""
+        game_ids = np.asarray(game_ids)
+        game_pos = np.searchsorted(self.games, game_ids)
+        known = game_pos < len(self.games)
+        known[known] = self.games[game_pos[known]] == game_ids[known]
+        keys = (game_pos.astype(np.int64) << 32) | np.asarray(frames, dtype=np.int64)
+        positions = np.searchsorted(self.keys, keys, side='right') - 1
+        valid = known & (positions >= 0)
+        valid[valid] = positions[valid] >= self.starts[game_pos[valid]]
+        return np.where(valid, positions, -1)
+
+    def asof(self, game_ids, frames, columns=None):
+        positions = self.asof_positions(game_ids, frames)
+        found = positions >= 0
+        take = np.where(found, positions, 0)
+        result = pd.DataFrame({col: self.columns[col][take] for col in columns or self.columns})
+        if not found.all():
+            result = result.where(pd.Series(found, index=result.index), axis=0)
+        return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Timeline store of lol_ranked_games.csv')
+    parser.add_argument('csv')
+    parser.add_argument('--save', default=None, help='write the store as .npy files to this directory')
+    parser.add_argument('--lookups', type=int, default=100000, help='random as-of lookups to time')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = TimelineStore.from_csv(args.csv)
+    print(f"[INFO] {len(store)} rows, {len(store.games)} games, built in {time.perf_counter() - start:.2f}s")
+    if args.save:
+        store.save(args.save)
+        store = TimelineStore.load(args.save)
+        print(f"[INFO] saved to {args.save}, reopened memory mapped")
+
+    rng = np.random.default_rng(0)
+    game_ids = rng.choice(store.games, args.lookups)
+    frames = rng.integers(0, 3600, args.lookups)
+    start = time.perf_counter()
+    store.asof(game_ids, frames, ['goldDiff', 'expDiff'])
+    print(f"[INFO] {args.lookups} vectorized as-of lookups in {time.perf_counter() - start:.3f}s")
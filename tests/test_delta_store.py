@@ -0,0 +1,100 @@
+"""Round trip of the delta storage (Checkpoint2/delta_store.py, spi.py --storage delta)."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'Checkpoint2'))
+
+from common.schema import COLUMNS, COUNTER_COLUMNS
+from delta_store import DeltaEncoder, decode, read_table
+from parallel_loader import ParallelLoader, create_loader_engine
+from spi import load_full
+
+TABLES = ['objectivestatus', 'structurestatus']
+
+
+def fake_games(n_games=6, seed=0):
+    """Rows in the CSV layout: per game 10-30 frames with cumulative counters that rarely change."""
+    rng = np.random.default_rng(seed)
+    games = []
+    for game in range(n_games):
+        n = int(rng.integers(10, 30))
+        frame = pd.DataFrame({col: np.zeros(n, dtype='int64') for col in COLUMNS})
+        frame['gameId'] = 4000000000 + game
+        frame['gameDuration'] = n * 60
+        frame['hasWon'] = game % 2
+        frame['frame'] = np.arange(1, n + 1) * 60
+        for col in ['goldDiff', 'expDiff']:
+            frame[col] = rng.integers(-5000, 5000, n)
+        frame['champLevelDiff'] = rng.integers(-3, 4, n)
+        for col in COUNTER_COLUMNS + ['kills', 'deaths', 'assists', 'wardsPlaced', 'wardsDestroyed', 'wardsLost']:
+            frame[col] = np.cumsum(rng.random(n) < 0.1)
+        games.append(frame)
+    return pd.concat(games, ignore_index=True)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'games.csv'
+    fake_games().to_csv(path, index=False)
+    return str(path)
+
+
+def load(csv_path, db_path, storage, chunksize):
+    engine = create_loader_engine(f'sqlite:///{db_path}', 1)
+    loader = ParallelLoader(engine, 1, 'native')
+    try:
+        load_full(csv_path, loader, chunksize, storage)
+    finally:
+        loader.close()
+    return engine
+
+
+def test_decode_reproduces_encoded_chunks():
+    table = fake_games()[['gameId', 'frame'] + COUNTER_COLUMNS]
+    encoder = DeltaEncoder('objectivestatus', list(table.columns))
+    # Chunks of 7 rows split most games, the encoder has to continue them
+    changes = pd.concat([encoder.encode(table.iloc[start:start + 7]) for start in range(0, len(table), 7)],
+                        ignore_index=True)
+
+    assert len(changes) < table[COUNTER_COLUMNS].size
+    decoded = decode(table[['gameId', 'frame']], changes, encoder.fields)
+    np.testing.assert_array_equal(decoded.to_numpy(dtype='float64'), table.to_numpy(dtype='float64'))
+
+
+@pytest.mark.parametrize('chunksize', [25, 1000])
+def test_delta_tables_read_back_as_the_wide_tables(csv_path, tmp_path, chunksize):
+    wide_engine = load(csv_path, tmp_path / 'wide.db', 'wide', chunksize)
+    delta_engine = load(csv_path, tmp_path / 'delta.db', 'delta', chunksize)
+
+    with wide_engine.connect() as wide, delta_engine.connect() as delta:
+        for table in TABLES:
+            expected = pd.read_sql(f"SELECT * FROM {table}", wide).sort_values(['gameId', 'frame'], kind='stable')
+            actual = read_table(delta, table)
+            assert list(actual.columns) == list(expected.columns)
+            np.testing.assert_array_equal(actual.to_numpy(dtype='float64'), expected.to_numpy(dtype='float64'))
+
+
+def test_read_table_of_some_games(csv_path, tmp_path):
+    delta_engine = load(csv_path, tmp_path / 'delta.db', 'delta', 25)
+    with delta_engine.connect() as delta:
+        everything = read_table(delta, 'structurestatus')
+        some = read_table(delta, 'structurestatus', game_ids=[4000000001, 4000000004])
+
+    expected = everything[everything['gameId'].isin([4000000001, 4000000004])].reset_index(drop=True)
+    pd.testing.assert_frame_equal(some, expected)
+
+
+def test_decode_rejects_changes_without_a_frame():
+    table = fake_games(n_games=2)[['gameId', 'frame'] + COUNTER_COLUMNS]
+    encoder = DeltaEncoder('objectivestatus', list(table.columns))
+    changes = encoder.encode(table)
+    orphan = pd.DataFrame({'gameId': [4000000009], 'frame': [60], 'field': [0], 'value': [1.0]})
+
+    with pytest.raises(ValueError, match='no row in the frame index'):
+        decode(table[['gameId', 'frame']], pd.concat([changes, orphan], ignore_index=True), encoder.fields)
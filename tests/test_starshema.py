@@ -0,0 +1,67 @@
+"""Deferred index mode of the fact table (Checkpoint3/starshema.py, etl_fake.py --defer-indexes)."""
+import os
+import sys
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, inspect
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Checkpoint3 import starshema
+from Checkpoint3.starshema import Base, FACT_INDEXES, deferred_indexes
+
+
+def fact_indexes(engine):
+    return {index['name'] for index in inspect(engine).get_indexes('fact_game_event')}
+
+
+def test_deferred_indexes_are_rebuilt_after_the_load():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    names = {index.name for index in FACT_INDEXES}
+    assert names <= fact_indexes(engine)
+
+    with deferred_indexes(engine):
+        assert not names & fact_indexes(engine)
+    assert names <= fact_indexes(engine)
+    assert len(inspect(engine).get_foreign_keys('fact_game_event')) == 5
+
+
+class RecordingConnection:
+    """Stands in for a MySQL connection: records the statements, knows two foreign keys."""
+
+    def __init__(self, log, foreign_keys):
+        self.log = log
+        self.foreign_keys = foreign_keys
+
+    def execute(self, statement):
+        sql = str(statement)
+        self.log.append(sql.split('(')[0].strip() if 'ADD FOREIGN KEY' in sql else sql)
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: self.foreign_keys))
+
+
+@pytest.mark.parametrize('foreign_keys', [['fk_game', 'fk_frame'], []])
+def test_mysql_foreign_keys_are_dropped_before_the_indexes(monkeypatch, foreign_keys):
+    log = []
+
+    @contextmanager
+    def begin():
+        yield RecordingConnection(log, foreign_keys)
+
+    engine = SimpleNamespace(dialect=SimpleNamespace(name='mysql'), begin=begin)
+    monkeypatch.setattr(starshema, 'drop_fact_indexes', lambda engine: log.append('drop indexes'))
+    monkeypatch.setattr(starshema, 'create_fact_indexes', lambda engine: log.append('create indexes'))
+
+    with deferred_indexes(engine):
+        log.append('load')
+
+    drops = [f"ALTER TABLE fact_game_event DROP FOREIGN KEY `{name}`" for name in foreign_keys]
+    assert log[1:1 + len(drops)] == drops
+    assert log[1 + len(drops):4 + len(drops)] == ['drop indexes', 'load', 'create indexes']
+    adds = [entry for entry in log if entry.startswith('ALTER TABLE fact_game_event ADD FOREIGN KEY')]
+    # Partitioned tables have no foreign keys and get none back
+    assert len(adds) == (5 if foreign_keys else 0)
+    if adds:
+        assert log.index(adds[0]) > log.index('create indexes')